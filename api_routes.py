@@ -431,6 +431,7 @@ def get_feedback():
                 'message_id': fb.message_id,
                 'rating': fb.rating,
                 'comment': fb.comment,
+                'confirmed_intent': fb.confirmed_intent,
                 'created_at': fb.created_at.isoformat()
             })
         
@@ -14,7 +14,7 @@ from chatbot.intent_handler import IntentHandler
 from chatbot.response_generator import ResponseGenerator
 
 # Import database handlers
-from database.db_handler import get_db_session, init_db
+from database.db_handler import get_db_session, init_db, Session
 from database.models import Conversation, Message
 from database.user_models import User
 
@@ -42,6 +42,11 @@ app.register_blueprint(auth, url_prefix='/auth')
 # Initialize database
 db = SQLAlchemy(app)
 
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    """Each request uses one scoped session; release it (and its connection) afterwards"""
+    Session.remove()
+
 # Set up logger
 logger = setup_logger(__name__, Config.LOG_LEVEL, Config.LOG_FILE)
 
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Dict
 from backend.core.security import get_current_admin
-from backend.schemas.admin import IntentCreate, IntentUpdate, RetrainResponse
+from backend.core.executor import executor
+from backend.schemas.admin import IntentCreate, IntentUpdate, MessageLabel, RetrainResponse, RetrainJobStatus
 from backend.services.intent_service import IntentService
 from backend.services.retrain_service import RetrainService
+from backend.core.components import components
+from database.db_handler import add_feedback, get_db_session
+from database.models import Message
 
 router = APIRouter(dependencies=[Depends(get_current_admin)])
 
@@ -11,6 +15,10 @@ router = APIRouter(dependencies=[Depends(get_current_admin)])
 intent_service = IntentService()
 retrain_service = RetrainService()
 
+# Optional OnlineLearner; created and scheduled by the app lifespan when
+# ONLINE_LEARNING_ENABLED is set
+online_learner = None
+
 # --- Intent Management Endpoints ---
 
 @router.get("/intents", response_model=List[Dict])
@@ -18,35 +26,76 @@ async def get_intents():
     """
     Get all intents from the training data.
     """
-    return intent_service.get_all_intents()
+    return await executor.run(intent_service.get_all_intents)
 
 @router.post("/intent", status_code=status.HTTP_201_CREATED)
 async def create_intent(intent: IntentCreate):
     """
     Create a new intent in the training data.
     """
-    return intent_service.create_intent(intent)
+    created = await executor.run(intent_service.create_intent, intent)
+    await executor.run(components.refresh_responses, [intent.tag])
+    return created
 
 @router.put("/intent/{intent_tag}")
 async def update_intent(intent_tag: str, intent: IntentUpdate):
     """
     Update an existing intent.
     """
-    return intent_service.update_intent(intent_tag, intent)
+    updated = await executor.run(intent_service.update_intent, intent_tag, intent)
+    await executor.run(components.refresh_responses, [intent_tag])
+    return updated
 
 @router.delete("/intent/{intent_tag}")
 async def delete_intent(intent_tag: str):
     """
     Delete an intent from the training data.
     """
-    return intent_service.delete_intent(intent_tag)
+    result = await executor.run(intent_service.delete_intent, intent_tag)
+    await executor.run(components.refresh_responses, [intent_tag])
+    return result
+
+@router.post("/messages/{message_id}/label", status_code=status.HTTP_201_CREATED)
+async def label_message(message_id: int, label: MessageLabel):
+    """
+    Record the intent a message should have been classified as. Online
+    learning uses confirmed labels regardless of rating.
+    """
+    def save_label():
+        db_session = get_db_session()
+        try:
+            if db_session.get(Message, message_id) is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Message {message_id} not found"
+                )
+            return add_feedback(message_id, rating=None, confirmed_intent=label.intent, session=db_session)
+        finally:
+            db_session.close()
 
-# --- Retraining Endpoint ---
+    feedback_id = await executor.run(save_label)
+    return {"feedback_id": feedback_id, "message_id": message_id, "intent": label.intent}
+
+# --- Retraining Endpoints ---
+
+@router.post("/retrain", response_model=RetrainResponse, status_code=status.HTTP_202_ACCEPTED)
+async def retrain_model(force: bool = False):
+    """
+    Submit a model retraining job and return immediately.
+    Only one job runs at a time; poll /retrain/{job_id} for its progress.
+    Jobs finish with stage 'skipped' when the training data is unchanged,
+    unless force is set.
+    """
+    job = await executor.run(retrain_service.submit_retrain, on_success=components.reload, force=force)
+    return RetrainResponse(
+        message="Model retraining job submitted",
+        job_id=job['job_id'],
+        status=job['status']
+    )
 
-@router.post("/retrain", response_model=RetrainResponse)
-async def retrain_model():
+@router.get("/retrain/{job_id}", response_model=RetrainJobStatus)
+async def get_retrain_job(job_id: str):
     """
-    Trigger the model retraining pipeline.
-    This process is protected by a lock to prevent concurrent runs.
+    Get status, progress, duration and resulting model version of a retraining job.
     """
-    return retrain_service.retrain_model()
+    return retrain_service.get_job(job_id)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 import uuid
 import sys
 import os
@@ -6,55 +7,95 @@ import os
 # Ensure root is in sys.path to import chatbot
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from backend.schemas.chat import ChatRequest, ChatResponse
-from chatbot.processor import ChatProcessor
-from chatbot.intent_handler import IntentHandler
-from chatbot.response_generator import ResponseGenerator
+from backend.core.config import settings
+from backend.core.executor import executor
+from backend.core.components import components
+from backend.core.database import get_db
+from backend.schemas.chat import (
+    ChatRequest, ChatResponse, ChatBatchRequest, ChatBatchResponse, ChatBatchResult, IntentScore,
+    FeedbackRequest, FeedbackResponse
+)
+from database.db_handler import add_feedback
+from database.models import Message
 
 router = APIRouter()
 
-# Initialize Chatbot components (Singleton)
-intent_handler = IntentHandler()
-response_generator = ResponseGenerator()
-chat_processor = ChatProcessor(intent_handler, response_generator)
+# Optional micro-batcher for the ML stage; created and started by the app
+# lifespan once the chatbot components are loaded
+micro_batcher = None
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+    chat_processor = components.require().chat_processor
     try:
         user_id = request.user_id or str(uuid.uuid4())
         
-        # Process the message
-        result = chat_processor.process_message(request.message, user_id)
-        
-        detected_intent = result['intent']
-        bot_response = result['response']
-        
-        # Retrieve confidence score
-        # Note: ChatProcessor doesn't return confidence, so we fetch it from the classifier
-        # to satisfy the API contract without modifying Phase 1 files.
-        confidence = 0.0
-        try:
-            if hasattr(chat_processor.intent_handler, 'ml_classifier'):
-                ml_intent, ml_conf = chat_processor.intent_handler.ml_classifier.predict(request.message)
-                
-                # If the detected intent matches ML prediction, use that confidence
-                if detected_intent == ml_intent:
-                    confidence = float(ml_conf)
-                else:
-                    # If intents differ, fallback logic was likely used.
-                    # We report the ML confidence if it's "unknown", otherwise we don't have a score.
-                    # For semantic fallback, we might assign a default "fallback confidence" or use ML's.
-                    # Here we default to ML confidence for consistency.
-                    confidence = float(ml_conf)
-        except Exception as e:
-            # Fallback if confidence retrieval fails
-            pass
+        # Share one predict_proba call with other in-flight requests
+        ml_prediction = None
+        if micro_batcher is not None:
+            ml_prediction = await micro_batcher.predict(request.message)
+
+        # Process the message; the result already carries the confidence of
+        # whichever stage resolved the intent, so nothing is classified twice
+        # Classification, response generation and the DB write are blocking,
+        # so they run on the worker pool instead of the event loop
+        result = await executor.run(
+            chat_processor.process_message, request.message, user_id, request.conversation_id,
+            ml_prediction=ml_prediction, db_session=db
+        )
 
         return ChatResponse(
-            intent=detected_intent,
-            confidence=confidence,
-            response=bot_response
+            intent=result['intent'],
+            confidence=result['confidence'],
+            response=result['response'],
+            stage=result['stage'],
+            timings=result['timings'],
+            conversation_id=result['conversation_id'],
+            message_id=result['message_id']
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Classify many messages in one call and return the top-k intents of each.
+    No responses are generated and nothing is persisted.
+    """
+    intent_handler = components.require().intent_handler
+    if len(request.messages) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size exceeds the limit of {settings.MAX_BATCH_SIZE} messages"
+        )
+
+    # Preprocessing and scoring up to MAX_BATCH_SIZE messages is blocking work;
+    # predict_batch handles its own errors, the pool may answer 503 when full
+    predictions = await executor.run(intent_handler.ml_classifier.predict_batch, request.messages, request.top_k)
+
+    return ChatBatchResponse(results=[
+        ChatBatchResult(
+            message=message,
+            intents=[IntentScore(intent=intent, confidence=confidence) for intent, confidence in scores]
+        )
+        for message, scores in zip(request.messages, predictions)
+    ])
+
+@router.post("/feedback", response_model=FeedbackResponse, status_code=status.HTTP_201_CREATED)
+async def feedback(request: FeedbackRequest, db: Session = Depends(get_db)):
+    """
+    Rate a message (1-5). Highly rated exchanges feed online learning.
+    """
+    def save_feedback():
+        if db.get(Message, request.message_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Message {request.message_id} not found"
+            )
+        return add_feedback(request.message_id, request.rating, request.comment, session=db)
+
+    return FeedbackResponse(feedback_id=await executor.run(save_feedback))
@@ -1,7 +1,53 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from backend.core.executor import executor
+from backend.core.components import components
+from backend.api import chat, admin
+from utils.text_processor import preprocess_cache_stats
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@router.get("/health/live")
+async def liveness():
+    """
+    The process is up and serving HTTP.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    200 once the NLTK data and the model are loaded, its pattern matrices are built and the
+    warm-up queries have run; 503 with the failing checks otherwise.
+    """
+    checks = components.readiness()
+    if not all(checks.values()):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "not ready", "checks": checks, "error": components.error}
+        )
+    return {"status": "ready", "checks": checks}
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Startup timings, worker pool queue depth, micro-batching, write-behind
+    flush lag, preprocessing cache counters and online learning state.
+    """
+    return {
+        "components": components.status(),
+        "executor": executor.stats(),
+        "micro_batcher": chat.micro_batcher.stats() if chat.micro_batcher is not None else None,
+        "write_behind": (
+            components.conversation_writer.stats() if components.conversation_writer is not None else None
+        ),
+        "preprocess_cache": preprocess_cache_stats(),
+        "online_learning": admin.online_learner.stats() if admin.online_learner is not None else None
+    }
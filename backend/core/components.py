@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from backend.core.config import settings
+from chatbot.processor import ChatProcessor
+from chatbot.intent_handler import IntentHandler
+from chatbot.response_generator import ResponseGenerator
+from chatbot.write_behind import ConversationWriter
+from utils.text_processor import nltk_data_available
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ChatComponents:
+    """
+    Holds the chatbot singletons used by the API and builds them on demand.
+
+    Nothing is loaded at import time. initialize() constructs the intent
+    handler and the response generator concurrently, since one is bound by
+    model loading and the other by the database, and records how long each
+    took, then runs the warm-up queries. Until the components exist,
+    require() turns requests away with 503; readiness() additionally waits
+    for the model, its pattern matrices and the warm-up.
+    """
+    def __init__(self):
+        self.intent_handler = None
+        self.response_generator = None
+        self.chat_processor = None
+        self.conversation_writer = None
+
+        # Seconds spent constructing each component, warming up, and 'total'
+        self.init_times = {}
+        self.warmed_up = False
+        self.error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def initialize(self):
+        """
+        Builds all components; safe to call more than once. Blocking, so
+        call it from a worker thread when an event loop is running.
+        """
+        with self._lock:
+            if self.ready:
+                # Restarted after shutdown(), e.g. by a second app lifespan
+                if self.conversation_writer is not None:
+                    self.conversation_writer.start()
+                return
+
+            start_time = time.perf_counter()
+            try:
+                with ThreadPoolExecutor(max_workers=2, thread_name_prefix='unibot-init') as pool:
+                    intent_handler = pool.submit(self._timed, 'intent_handler', IntentHandler)
+                    response_generator = pool.submit(self._timed, 'response_generator', ResponseGenerator)
+                    self.intent_handler = intent_handler.result()
+                    self.response_generator = response_generator.result()
+                if Config.WRITE_BEHIND_ENABLED:
+                    self.conversation_writer = ConversationWriter(
+                        batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+                        max_wait_ms=Config.WRITE_BEHIND_MAX_WAIT_MS,
+                        max_queue=Config.WRITE_BEHIND_MAX_QUEUE,
+                        spill_path=Config.WRITE_BEHIND_SPILL_PATH,
+                        max_attempts=Config.WRITE_BEHIND_MAX_ATTEMPTS
+                    )
+                    self.conversation_writer.start()
+                self.chat_processor = ChatProcessor(
+                    self.intent_handler, self.response_generator, self.conversation_writer
+                )
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Chatbot component initialization failed: {e}")
+                raise
+
+            self.error = None
+            self._ready.set()
+
+            # A failed warm-up leaves the worker serving but not ready
+            try:
+                self._timed('warm_up', self.warm_up)
+            except Exception as e:
+                self.error = f"Warm-up failed: {e}"
+                logger.error(self.error)
+
+            self.init_times['total'] = round(time.perf_counter() - start_time, 3)
+            logger.info(f"Chatbot components ready: {self.init_times}")
+
+    def _timed(self, name, factory):
+        start_time = time.perf_counter()
+        component = factory()
+        self.init_times[name] = round(time.perf_counter() - start_time, 3)
+        return component
+
+    def warm_up(self):
+        """
+        Runs settings.WARMUP_QUERIES through intent detection and response
+        generation, without persisting anything.
+        """
+        intents = self.intent_handler.warm_up(settings.WARMUP_QUERIES)
+        for intent in intents:
+            self.response_generator.generate_response(intent)
+        self.warmed_up = True
+        logger.info(f"Warmed up with {len(intents)} queries.")
+
+    def reload(self):
+        """
+        Hot-reloads the intent models and warms the new ones up. Before
+        initialization this is a no-op, as initialize() will pick up the
+        current artifacts anyway.
+        """
+        if self.ready:
+            self.intent_handler.reload()
+            try:
+                self.warm_up()
+            except Exception as e:
+                self.warmed_up = False
+                self.error = f"Warm-up failed: {e}"
+                logger.error(self.error)
+
+    def shutdown(self):
+        """
+        Flushes pending write-behind turns, spilling what cannot be written.
+        """
+        if self.conversation_writer is not None:
+            self.conversation_writer.stop()
+
+    def refresh_responses(self, intent_names):
+        """
+        Picks up admin edits to the responses of the given intents.
+        """
+        if self.ready:
+            self.response_generator.refresh_intents(intent_names)
+            self.response_generator.publish_change()
+
+    def readiness(self):
+        """
+        Checks that decide whether this worker should receive traffic.
+
+        Returns:
+            dict: Check name -> bool.
+        """
+        if not self.ready:
+            return {
+                'nltk_data': nltk_data_available(),
+                'components_loaded': False,
+                'model_loaded': False,
+                'pattern_matrices_built': False,
+                'warmed_up': False
+            }
+        ml_classifier = self.intent_handler.ml_classifier
+        semantic_index_built = (
+            self.intent_handler.pattern_index is not None
+            if self.intent_handler.nlp else ml_classifier.pattern_index is not None
+        )
+        return {
+            'nltk_data': nltk_data_available(),
+            'components_loaded': True,
+            'model_loaded': ml_classifier.model is not None,
+            'pattern_matrices_built': semantic_index_built,
+            'warmed_up': self.warmed_up
+        }
+
+    def require(self):
+        """
+        Readiness gate for request handlers.
+
+        Raises:
+            HTTPException: 503 while the components are still loading.
+        """
+        if not self.ready:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Chatbot is starting up, please retry"
+            )
+        return self
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'init_seconds': dict(self.init_times),
+            'error': self.error
+        }
+
+components = ChatComponents()
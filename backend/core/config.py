@@ -18,6 +18,32 @@ class Settings:
     
     # Chatbot
     CONFIDENCE_THRESHOLD: float = float(os.environ.get('CONFIDENCE_THRESHOLD', '0.7'))
+    # Seconds between checks for model artifacts retrained by another worker (0 = off)
+    MODEL_RELOAD_INTERVAL: float = float(os.environ.get('MODEL_RELOAD_INTERVAL', '30'))
+    # Seconds between online learning runs over new feedback (opt-in; enable
+    # on one node only). Learning parameters are in config.Config (ONLINE_*)
+    ONLINE_LEARNING_ENABLED: bool = os.environ.get('ONLINE_LEARNING_ENABLED', 'False').lower() == 'true'
+    ONLINE_LEARNING_INTERVAL: float = float(os.environ.get('ONLINE_LEARNING_INTERVAL', '600'))
+    MAX_BATCH_SIZE: int = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+    # 'eager' loads the chatbot components before serving; 'background' starts
+    # serving at once and answers chat requests with 503 until they are ready
+    STARTUP_MODE: str = os.environ.get('STARTUP_MODE', 'eager')
+    # Sample queries ('|'-separated) run through every stage before /health/ready passes
+    WARMUP_QUERIES: list = [
+        query.strip() for query in os.environ.get(
+            'WARMUP_QUERIES',
+            'hello|who are you|what are the admission requirements|tell me a joke|thanks, bye'
+        ).split('|') if query.strip()
+    ]
+    
+    # Thread pool for blocking work called from async endpoints
+    WORKER_THREADS: int = int(os.environ.get('WORKER_THREADS', '8'))
+    WORKER_QUEUE_LIMIT: int = int(os.environ.get('WORKER_QUEUE_LIMIT', '256'))  # 0 = unlimited
+    
+    # Micro-batching of concurrent /chat classifications (opt-in)
+    MICRO_BATCH_ENABLED: bool = os.environ.get('MICRO_BATCH_ENABLED', 'False').lower() == 'true'
+    MICRO_BATCH_MAX_SIZE: int = int(os.environ.get('MICRO_BATCH_MAX_SIZE', '32'))
+    MICRO_BATCH_MAX_WAIT_MS: float = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', '2'))
     
     # Logging
     LOG_LEVEL: str = os.environ.get('LOG_LEVEL', 'INFO')
@@ -0,0 +1,16 @@
+from typing import Iterator
+from sqlalchemy.orm import Session
+from database.db_handler import session_factory
+
+def get_db() -> Iterator[Session]:
+    """
+    Request-scoped database session dependency.
+
+    Each request gets one session, and through it at most one pooled
+    connection, which is returned to the pool when the response is done.
+    """
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class BoundedExecutor:
+    """
+    Runs blocking work (classification, file and database I/O) from async
+    endpoints on a fixed-size thread pool, so it never stalls the event loop.
+
+    At most `max_queue` calls may wait for a free thread (0 = unlimited);
+    beyond that new work is rejected with 503 instead of piling up latency.
+    """
+    def __init__(self, max_workers, max_queue=0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_queue_depth = 0
+        self._total_wait = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits its result.
+        """
+        with self._lock:
+            if self.max_queue and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please retry"
+                )
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='unibot-worker'
+                )
+            pool = self._executor
+
+        future = pool.submit(self._call, fn, args, kwargs, time.perf_counter())
+        # A caller cancelled before a thread picked the call up (client gone,
+        # timeout) cancels it too; _call then never runs to count it off
+        future.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_cancelled(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def _call(self, fn, args, kwargs, submitted_at):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self._total_wait += time.perf_counter() - submitted_at
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'peak_queue_depth': self.peak_queue_depth,
+                'avg_queue_wait_ms': round(self._total_wait / started * 1000, 3) if started else 0.0
+            }
+
+    def shutdown(self):
+        """
+        Waits for running work and releases the threads. The pool is
+        recreated on the next run() call.
+        """
+        with self._lock:
+            pool, self._executor = self._executor, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+            logger.info("Worker thread pool shut down.")
+
+executor = BoundedExecutor(settings.WORKER_THREADS, settings.WORKER_QUEUE_LIMIT)
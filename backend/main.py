@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 from backend.core.config import settings
+from backend.core.executor import executor
+from backend.core.components import components
 from backend.api import chat, health, admin
+from backend.services.micro_batcher import MicroBatcher
+from chatbot.online_learner import OnlineLearner
 from database.db_handler import init_db
 import logging
 
@@ -10,6 +15,65 @@ import logging
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+async def watch_model_artifacts(interval):
+    """
+    Hot-reloads the intent model when its artifacts were replaced by a retrain
+    running in another worker process, and the responses when another worker
+    changed them.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not components.ready:
+                continue
+            if components.intent_handler.ml_classifier.artifacts_changed():
+                logger.info("Model artifacts changed on disk, reloading...")
+                await executor.run(components.reload)
+        except Exception as e:
+            logger.error(f"Model reload failed: {e}")
+        try:
+            if components.response_generator.responses_changed():
+                logger.info("Responses changed in another worker, reloading...")
+                await executor.run(components.response_generator.load_responses)
+        except Exception as e:
+            logger.error(f"Response reload failed: {e}")
+
+async def run_online_learning(learner, interval):
+    """
+    Periodically applies online updates from new feedback, and serves the
+    updated model right away; other workers reload it through the watcher.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not components.ready or admin.retrain_service.is_running():
+                continue
+            result = await executor.run(learner.run_once)
+            if result['status'] == 'updated':
+                await executor.run(components.reload)
+            elif result['status'] == 'unsupported':
+                logger.warning(f"Online learning is idle: {result['reason']} (train with FEATURE_MODE=hashing)")
+        except Exception as e:
+            logger.error(f"Online learning run failed: {e}")
+
+async def start_components():
+    """
+    Loads the chatbot components off the event loop, then starts the
+    micro-batcher that depends on them.
+    """
+    try:
+        await executor.run(components.initialize)
+    except Exception:
+        return
+    if settings.MICRO_BATCH_ENABLED:
+        chat.micro_batcher = MicroBatcher(
+            components.intent_handler.ml_classifier,
+            max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+            executor=executor
+        )
+        await chat.micro_batcher.start()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -19,9 +83,35 @@ async def lifespan(app: FastAPI):
         logger.info("Database initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
+    component_loader = None
+    if settings.STARTUP_MODE == 'background':
+        # Serve immediately; chat endpoints answer 503 until loading finishes
+        component_loader = asyncio.create_task(start_components())
+    else:
+        await start_components()
+    model_watcher = None
+    if settings.MODEL_RELOAD_INTERVAL > 0:
+        model_watcher = asyncio.create_task(watch_model_artifacts(settings.MODEL_RELOAD_INTERVAL))
+    online_learning = None
+    if settings.ONLINE_LEARNING_ENABLED:
+        admin.online_learner = OnlineLearner()
+        online_learning = asyncio.create_task(
+            run_online_learning(admin.online_learner, settings.ONLINE_LEARNING_INTERVAL)
+        )
     yield
     # Shutdown
-    pass
+    if model_watcher is not None:
+        model_watcher.cancel()
+    if online_learning is not None:
+        online_learning.cancel()
+        admin.online_learner = None
+    if component_loader is not None:
+        await component_loader
+    if chat.micro_batcher is not None:
+        await chat.micro_batcher.stop()
+        chat.micro_batcher = None
+    await executor.run(components.shutdown)
+    executor.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
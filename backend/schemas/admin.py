@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class IntentExample(BaseModel):
     text: str = Field(..., min_length=1, description="Example sentence for the intent")
@@ -13,7 +13,24 @@ class IntentUpdate(BaseModel):
     patterns: Optional[List[str]] = Field(None, min_items=1)
     responses: Optional[List[str]] = Field(None, min_items=1)
 
+class MessageLabel(BaseModel):
+    intent: str = Field(..., min_length=1, description="The intent the message should have been classified as")
+
 class RetrainResponse(BaseModel):
     message: str
-    model_version: str
+    job_id: str
     status: str
+    model_version: Optional[str] = None
+
+class RetrainJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed or failed
+    stage: str  # 'skipped' when the model was already up to date
+    progress: float
+    submitted_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    model_version: Optional[str] = None
+    fit: Optional[Dict] = None  # warm/cold fit, iterations, cold baseline and iterations saved
+    error: Optional[str] = None
@@ -1,11 +1,43 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 class ChatRequest(BaseModel):
     user_id: Optional[str] = None
+    conversation_id: Optional[int] = None
     message: str
 
 class ChatResponse(BaseModel):
     intent: str
     confidence: float
     response: str
+    stage: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+    # Pass message_id to /feedback and conversation_id to the next /chat call;
+    # message_id is None while the turn is queued for write-behind
+    conversation_id: Optional[int] = None
+    message_id: Optional[int] = None
+
+
+class FeedbackRequest(BaseModel):
+    message_id: int
+    rating: int = Field(..., ge=1, le=5)
+    comment: Optional[str] = None
+
+class FeedbackResponse(BaseModel):
+    feedback_id: int
+
+
+class IntentScore(BaseModel):
+    intent: str
+    confidence: float
+
+class ChatBatchRequest(BaseModel):
+    messages: List[str] = Field(..., min_items=1, description="Messages to classify")
+    top_k: int = Field(1, ge=1, description="Number of intents to return per message")
+
+class ChatBatchResult(BaseModel):
+    message: str
+    intents: List[IntentScore]
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchResult]
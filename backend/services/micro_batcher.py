@@ -0,0 +1,124 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-message classifications into one
+    predict_batch call.
+
+    Requests are collected until `max_batch_size` items are waiting or
+    `max_wait_ms` has passed since the first one arrived. The batch is then
+    scored in one call and each waiting request gets its own result back.
+    """
+    def __init__(self, classifier, max_batch_size=32, max_wait_ms=2.0, executor=None):
+        self.classifier = classifier
+        # BoundedExecutor to score batches on; the loop's default pool if None
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = None
+        self._worker = None
+        self._in_flight = []
+
+        # Counters for monitoring the effective batch size
+        self.batches = 0
+        self.items = 0
+
+    async def start(self):
+        """
+        Starts the background batching task on the running event loop.
+        """
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"Micro-batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g})"
+        )
+
+    async def stop(self):
+        """
+        Stops the background task and fails any requests still waiting.
+        """
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        pending = list(self._in_flight)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        self._in_flight = []
+
+    async def predict(self, text):
+        """
+        Queues a message for classification and waits for its batch.
+
+        Returns:
+            tuple: (predicted_intent, confidence_score), like MLIntentClassifier.predict
+        """
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'queued': self._queue.qsize() if self._queue is not None else 0
+        }
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self._in_flight = batch
+            texts = [text for text, _ in batch]
+
+            try:
+                # Score off the event loop so the next batch keeps filling up
+                if self.executor is not None:
+                    predictions = await self.executor.run(self.classifier.predict_batch, texts)
+                else:
+                    predictions = await loop.run_in_executor(None, self.classifier.predict_batch, texts)
+            except Exception as e:
+                logger.error(f"Micro-batch prediction failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), scores in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(scores[0] if scores else (None, 0.0))
+            self._in_flight = []
@@ -1,87 +1,336 @@
 import os
+import json
+import queue
+import shutil
 import threading
 import logging
 import time
+import uuid
+import multiprocessing
 from datetime import datetime
 from fastapi import HTTPException, status
-from chatbot.train_intent_model import train_model
+from chatbot.train_intent_model import IntentModelTrainer
 
 logger = logging.getLogger(__name__)
 
+# Number of finished jobs kept around for status polling
+MAX_JOB_HISTORY = 50
+
+# A running job refreshes its record at least this often; a lock whose job
+# has been silent for LOCK_STALE_SECONDS belongs to a worker that died
+HEARTBEAT_SECONDS = 10
+LOCK_STALE_SECONDS = 120
+
+def _run_training_job(updates, force=False):
+    """
+    Entry point of the training process. Progress and the final outcome are
+    reported to the parent through the `updates` queue.
+    """
+    def report(stage, progress):
+        updates.put({'stage': stage, 'progress': progress})
+
+    try:
+        trainer = IntentModelTrainer()
+        trained = trainer.train(progress_callback=report, force=force)
+        updates.put({'status': 'trained' if trained else 'skipped', 'fit': trainer.fit_stats})
+    except Exception as e:
+        updates.put({'status': 'failed', 'error': str(e)})
+
 class RetrainService:
+    """
+    Runs model retraining as background jobs.
+
+    Each job trains in its own process, so it does not compete with request
+    handling for the GIL. A monitor thread in this process follows its
+    progress, versions the artifacts and runs the optional completion hook.
+
+    Job records (one JSON file per job) and the one-job-at-a-time lock file
+    live in the model directory, so every server worker sees the same jobs
+    and only one of them can retrain at a time.
+    """
     _lock = threading.Lock()
-    _is_training = False
-    
-    def __init__(self):
-        self.model_dir = os.path.join(
+
+    def __init__(self, model_dir=None):
+        self.model_dir = model_dir or os.path.join(
             os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
             'chatbot',
             'model'
         )
+        self.jobs_dir = os.path.join(self.model_dir, 'retrain_jobs')
+        self.lock_path = os.path.join(self.model_dir, 'retrain.lock')
+        self._mp_context = multiprocessing.get_context('spawn')
 
-    def retrain_model(self) -> dict:
-        """
-        Trigger model retraining safely.
+    def submit_retrain(self, on_success=None, force=False) -> dict:
         """
-        if RetrainService._is_training:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Model retraining is already in progress"
-            )
+        Start a retraining job and return immediately.
 
+        Args:
+            on_success (callable, optional): Called in the background once the
+                new artifacts are written, e.g. to reload the serving model.
+            force (bool): Retrain even if the training data and settings are
+                unchanged since the current model was trained.
+
+        Returns:
+            dict: The job record, including its job_id for status polling.
+        """
         with RetrainService._lock:
-            # Double-check inside lock
-            if RetrainService._is_training:
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0.0,
+                'submitted_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'duration_seconds': None,
+                'model_version': None,
+                'fit': None,
+                'error': None,
+                'heartbeat_at': time.time()
+            }
+            active_job_id = self._acquire_lock(job['job_id'])
+            if active_job_id is not None:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
-                    detail="Model retraining is already in progress"
+                    detail=f"Model retraining is already in progress (job {active_job_id})"
                 )
-            
-            RetrainService._is_training = True
-            
+            self._write_job(job)
+            self._prune_history(job['job_id'])
+
+        threading.Thread(
+            target=self._run_job,
+            args=(job, on_success, force),
+            name=f"retrain-{job['job_id'][:8]}",
+            daemon=True
+        ).start()
+
+        logger.info(f"Submitted retraining job {job['job_id']}")
+        return dict(job)
+
+    def is_running(self) -> bool:
+        """
+        True while a retraining job is queued or running in any worker.
+        """
+        with RetrainService._lock:
+            return self._lock_holder() is not None
+
+    def get_job(self, job_id: str) -> dict:
+        """
+        Return the current state of a retraining job, whichever worker runs it.
+        """
+        job = self._read_job(job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Retraining job '{job_id}' not found"
+            )
+        if job['status'] in ('queued', 'running') and self._is_stale(job):
+            job.update(status='failed', error='Retraining worker stopped responding')
+        return job
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _read_job(self, job_id):
+        # Job ids are uuid hex; anything else cannot name a job file
+        if not job_id or not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_job(self, job):
+        """
+        Writes the job record by rename, so readers in other workers never
+        see a partial file.
+        """
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._job_path(job['job_id'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _update_job(self, job, **fields):
+        with RetrainService._lock:
+            job.update(fields, heartbeat_at=time.time())
+            self._write_job(job)
+
+    def _is_stale(self, job):
+        return time.time() - job.get('heartbeat_at', 0) > LOCK_STALE_SECONDS
+
+    def _lock_holder(self):
+        """
+        Returns the id of the job holding the lock file, removing the lock
+        if its job has finished or its worker died. Caller holds _lock.
+        """
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                job_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            return 'unknown'
+
+        job = self._read_job(job_id)
+        if job is not None and job['status'] in ('queued', 'running') and not self._is_stale(job):
+            return job_id
+        if job is None:
+            # The holder may not have written its record yet
+            try:
+                if time.time() - os.path.getmtime(self.lock_path) <= LOCK_STALE_SECONDS:
+                    return job_id
+            except OSError:
+                return None
+        logger.warning(f"Removing stale retraining lock of job {job_id}")
+        self._release_lock(job_id)
+        return None
+
+    def _acquire_lock(self, job_id):
+        """
+        Creates the lock file for `job_id`. Returns None on success, otherwise
+        the id of the job that holds it. Caller holds _lock.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        for _ in range(2):
             try:
-                logger.info("Starting model retraining...")
-                start_time = time.time()
-                
-                # Call existing training logic
-                # Note: train_model saves to 'chatbot/model/' by default
-                train_model()
-                
-                # Create versioned artifacts
-                version = datetime.now().strftime("%Y%m%d_%H%M%S")
-                self._version_artifacts(version)
-                
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._lock_holder()
+                if holder is not None:
+                    return holder
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(job_id)
+            return None
+        return 'unknown'
+
+    def _release_lock(self, job_id):
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                if f.read().strip() != job_id:
+                    return
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    def _run_job(self, job, on_success, force=False):
+        start_time = time.time()
+        self._update_job(job, status='running', stage='starting', started_at=datetime.now().isoformat())
+        logger.info(f"Starting model retraining job {job['job_id']}...")
+
+        try:
+            outcome = self._train_in_subprocess(job, force)
+            if outcome.get('status') == 'skipped':
+                # Same corpus and settings: the serving model is already current
                 duration = time.time() - start_time
-                logger.info(f"Model retraining completed in {duration:.2f}s")
-                
-                return {
-                    "message": "Model retraining completed successfully",
-                    "model_version": version,
-                    "status": "success"
-                }
-                
-            except Exception as e:
-                logger.error(f"Model retraining failed: {e}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Model retraining failed: {str(e)}"
+                self._update_job(
+                    job,
+                    status='completed',
+                    stage='skipped',
+                    progress=1.0,
+                    finished_at=datetime.now().isoformat(),
+                    duration_seconds=round(duration, 3)
                 )
-            finally:
-                RetrainService._is_training = False
+                logger.info(f"Model retraining job {job['job_id']} skipped: model is up to date")
+                return
+            if outcome.get('status') != 'trained':
+                raise RuntimeError(outcome.get('error') or 'Training process exited unexpectedly')
+
+            # Create versioned artifacts
+            version = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._version_artifacts(version)
+            self._update_job(job, model_version=version, fit=outcome.get('fit'))
+
+            if on_success:
+                self._update_job(job, stage='reloading')
+                on_success()
+
+            duration = time.time() - start_time
+            self._update_job(
+                job,
+                status='completed',
+                stage='completed',
+                progress=1.0,
+                finished_at=datetime.now().isoformat(),
+                duration_seconds=round(duration, 3)
+            )
+            logger.info(f"Model retraining job {job['job_id']} completed in {duration:.2f}s")
+
+        except Exception as e:
+            logger.error(f"Model retraining job {job['job_id']} failed: {e}")
+            self._update_job(
+                job,
+                status='failed',
+                finished_at=datetime.now().isoformat(),
+                duration_seconds=round(time.time() - start_time, 3),
+                error=str(e)
+            )
+        finally:
+            with RetrainService._lock:
+                self._release_lock(job['job_id'])
+
+    def _train_in_subprocess(self, job, force=False) -> dict:
+        """
+        Run the trainer in a child process, relaying its progress updates
+        into the job record until it reports an outcome.
+        """
+        updates = self._mp_context.Queue()
+        process = self._mp_context.Process(target=_run_training_job, args=(updates, force), daemon=True)
+        process.start()
+
+        last_heartbeat = time.time()
+        try:
+            while True:
+                try:
+                    message = updates.get(timeout=1)
+                except queue.Empty:
+                    if not process.is_alive():
+                        return {'status': 'failed', 'error': f"Training process exited with code {process.exitcode}"}
+                    if time.time() - last_heartbeat >= HEARTBEAT_SECONDS:
+                        # Keeps other workers from taking the lock as stale
+                        self._update_job(job)
+                        last_heartbeat = time.time()
+                    continue
+
+                if 'status' in message:
+                    return message
+                self._update_job(job, stage=message['stage'], progress=message['progress'])
+        finally:
+            process.join()
+
+    def _prune_history(self, active_job_id):
+        """
+        Delete the oldest job records beyond MAX_JOB_HISTORY. Caller holds _lock.
+        """
+        try:
+            names = [name for name in os.listdir(self.jobs_dir) if name.endswith('.json')]
+        except OSError:
+            return
+        paths = sorted(
+            (os.path.join(self.jobs_dir, name) for name in names if name != f"{active_job_id}.json"),
+            key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0
+        )
+        for path in paths[:max(0, len(paths) + 1 - MAX_JOB_HISTORY)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
     def _version_artifacts(self, version: str):
         """
         Create versioned copies of model artifacts.
         """
         artifacts = ['intent_classifier.pkl', 'tfidf_vectorizer.pkl']
-        
+
         for artifact in artifacts:
             src = os.path.join(self.model_dir, artifact)
             dst = os.path.join(self.model_dir, f"{artifact.split('.')[0]}_{version}.pkl")
-            
+
             if os.path.exists(src):
                 try:
-                    import shutil
                     shutil.copy2(src, dst)
                     logger.info(f"Created versioned artifact: {dst}")
                 except Exception as e:
@@ -0,0 +1,101 @@
+"""
+Concurrent chat-write throughput against SQLite, with the default engine
+and with the tuned profile from database/db_handler.py (WAL, single writer
+connection, reader pool).
+
+    python bench_sqlite_writes.py
+    BENCH_WRITERS=16 BENCH_READERS=0 BENCH_DIR=/var/lib/unibot python bench_sqlite_writes.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Add root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.models import Base, Conversation, Message
+from database.db_handler import create_engines, create_session_factory
+
+WRITER_THREADS = int(os.environ.get('BENCH_WRITERS', '8'))
+READER_THREADS = int(os.environ.get('BENCH_READERS', '4'))
+TURNS_PER_WRITER = int(os.environ.get('BENCH_TURNS', '200'))
+# Put this on the same disk as the production database for realistic fsync costs
+BENCH_DIR = os.environ.get('BENCH_DIR')
+
+def save_turn(Session, user_id, turn):
+    """One chat turn, written the way ChatProcessor._save_conversation does it"""
+    session = Session()
+    try:
+        conversation = Conversation(user_id=user_id)
+        session.add(conversation)
+        session.flush()
+        session.add(Message(conversation_id=conversation.id, sender='user', content=f"message {turn}", timestamp=datetime.now()))
+        session.add(Message(conversation_id=conversation.id, sender='bot', content=f"reply {turn}", timestamp=datetime.now()))
+        conversation.last_updated = datetime.now()
+        session.commit()
+        return True
+    except Exception:
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+def run(label, sqlite_tuning):
+    directory = tempfile.mkdtemp(prefix='unibot-bench-', dir=BENCH_DIR)
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    writer, reader = create_engines(url, sqlite_tuning=sqlite_tuning)
+    Base.metadata.create_all(writer)
+    Session = create_session_factory(writer, reader)
+
+    results = {'written': 0, 'failed': 0, 'reads': 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write_turns(worker):
+        for turn in range(TURNS_PER_WRITER):
+            ok = save_turn(Session, worker, turn)
+            with lock:
+                results['written' if ok else 'failed'] += 1
+
+    def read_history():
+        while not done.is_set():
+            session = Session()
+            try:
+                session.query(Message).order_by(Message.id.desc()).limit(20).all()
+                with lock:
+                    results['reads'] += 1
+            except Exception:
+                session.rollback()
+            finally:
+                session.close()
+
+    readers = [threading.Thread(target=read_history) for _ in range(READER_THREADS)]
+    writers = [threading.Thread(target=write_turns, args=(i,)) for i in range(WRITER_THREADS)]
+    start = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    writer.dispose()
+    reader.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    print(
+        f"{label:>8}: {results['written'] / elapsed:8.1f} turns/s  "
+        f"{results['reads'] / elapsed:8.1f} reads/s  "
+        f"failed writes: {results['failed']}  ({elapsed:.2f}s)"
+    )
+
+if __name__ == "__main__":
+    print(f"{WRITER_THREADS} writer threads x {TURNS_PER_WRITER} turns, {READER_THREADS} reader threads")
+    run('default', sqlite_tuning=False)
+    run('tuned', sqlite_tuning=True)
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import Counter
+import numpy as np
+from scipy import sparse
+
+# Bump when the on-disk layout changes
+FORMAT_VERSION = 1
+
+def file_digest(path):
+    """
+    SHA-1 of a file's contents; ties a compact export to the pickles it came from.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _save_array(output_dir, name, array):
+    path = os.path.join(output_dir, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+def _probability_mode(classifier, n_features):
+    """
+    Works out how the classifier turns decision scores into probabilities
+    by comparing predict_proba with each candidate formula on probe inputs.
+    """
+    rng = np.random.default_rng(0)
+    probe = sparse.random(8, n_features, density=min(1.0, 20 / n_features), format='csr', random_state=rng)
+    expected = classifier.predict_proba(probe)
+    scores = probe @ classifier.coef_.T + classifier.intercept_
+
+    for mode in ('softmax', 'ovr', 'binary'):
+        try:
+            if np.allclose(_scores_to_proba(np.asarray(scores), mode), expected, atol=1e-6):
+                return mode
+        except ValueError:
+            continue
+    raise ValueError("Unsupported classifier: cannot reproduce predict_proba from coef_/intercept_")
+
+def _scores_to_proba(scores, mode):
+    if mode == 'binary':
+        if scores.shape[1] != 1:
+            raise ValueError("binary mode expects one score column")
+        positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+        return np.column_stack([1.0 - positive, positive])
+    if mode == 'ovr':
+        proba = 1.0 / (1.0 + np.exp(-scores))
+        return proba / proba.sum(axis=1, keepdims=True)
+    shifted = scores - scores.max(axis=1, keepdims=True)
+    proba = np.exp(shifted)
+    return proba / proba.sum(axis=1, keepdims=True)
+
+def export_compact_model(vectorizer, classifier, output_dir, source_digests=None):
+    """
+    Exports a fitted TfidfVectorizer + linear classifier as flat arrays:
+    vocab.txt (one term per line, in column order), idf.npy, coef.npy,
+    intercept.npy, classes.npy and meta.json. meta.json is written last and
+    marks the export as complete.
+
+    Args:
+        vectorizer: Fitted TfidfVectorizer with a word analyzer.
+        classifier: Fitted linear classifier with coef_, intercept_ and predict_proba.
+        output_dir (str): Directory to write to; created if missing.
+        source_digests (dict, optional): Digests of the pickles this export mirrors.
+    """
+    if getattr(vectorizer, 'analyzer', None) != 'word' or not hasattr(vectorizer, 'idf_'):
+        raise ValueError("Only fitted word-level TfidfVectorizer models can be exported")
+    if vectorizer.tokenizer is not None or vectorizer.preprocessor is not None or vectorizer.stop_words:
+        raise ValueError("Custom tokenizers, preprocessors and stop words are not supported")
+
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        if '\n' in term:
+            raise ValueError(f"Vocabulary term {term!r} contains a newline")
+        terms[column] = term
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Any existing export is incomplete from here until meta.json is rewritten
+    meta_path = os.path.join(output_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    with open(os.path.join(output_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(terms))
+    _save_array(output_dir, 'idf.npy', np.asarray(vectorizer.idf_, dtype=np.float64))
+    _save_array(output_dir, 'coef.npy', np.ascontiguousarray(classifier.coef_, dtype=np.float64))
+    _save_array(output_dir, 'intercept.npy', np.asarray(classifier.intercept_, dtype=np.float64))
+    _save_array(output_dir, 'classes.npy', np.asarray(classifier.classes_).astype(str))
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'n_features': len(terms),
+        'ngram_range': list(vectorizer.ngram_range),
+        'lowercase': bool(vectorizer.lowercase),
+        'token_pattern': vectorizer.token_pattern,
+        'binary': bool(vectorizer.binary),
+        'sublinear_tf': bool(vectorizer.sublinear_tf),
+        'use_idf': bool(vectorizer.use_idf),
+        'norm': vectorizer.norm,
+        'probability': _probability_mode(classifier, len(terms)),
+        'source_digests': source_digests or {}
+    }
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+    os.replace(meta_path + '.tmp', meta_path)
+
+def read_compact_meta(model_dir):
+    """
+    Returns the meta.json of a complete export, or None if there is none.
+    """
+    try:
+        with open(os.path.join(model_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format_version') != FORMAT_VERSION:
+        return None
+    return meta
+
+class CompactIntentModel:
+    """
+    Inference-only TF-IDF + linear model backed by (memory-mapped) flat arrays.
+
+    It reproduces TfidfVectorizer.transform and predict_proba without
+    importing sklearn, and offers the same transform/predict_proba/classes_
+    interface, so MLIntentClassifier can use one object as both its
+    vectorizer and its classifier.
+    """
+    def __init__(self, meta, vocabulary, idf, coef, intercept, classes):
+        self.meta = meta
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.n_features_in_ = meta['n_features']
+
+        self.min_n, self.max_n = meta['ngram_range']
+        self.token_pattern = re.compile(meta['token_pattern'])
+
+    @classmethod
+    def load(cls, model_dir, mmap=True):
+        """
+        Loads an export written by export_compact_model.
+
+        Args:
+            model_dir (str): Export directory.
+            mmap (bool): Memory-map the arrays instead of reading them into memory.
+        """
+        meta = read_compact_meta(model_dir)
+        if meta is None:
+            raise FileNotFoundError(f"No complete compact model export in {model_dir}")
+
+        mmap_mode = 'r' if mmap else None
+        def load_array(name):
+            return np.load(os.path.join(model_dir, name), mmap_mode=mmap_mode, allow_pickle=False)
+
+        with open(os.path.join(model_dir, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            terms = f.read().split('\n')
+        vocabulary = {term: column for column, term in enumerate(terms)}
+
+        return cls(
+            meta,
+            vocabulary,
+            load_array('idf.npy'),
+            load_array('coef.npy'),
+            load_array('intercept.npy'),
+            load_array('classes.npy'),
+        )
+
+    def _analyze(self, text):
+        if self.meta['lowercase']:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        terms = []
+        for n in range(self.min_n, self.max_n + 1):
+            if n == 1:
+                terms.extend(tokens)
+            else:
+                terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts):
+        """
+        Equivalent of TfidfVectorizer.transform.
+
+        Returns:
+            scipy.sparse.csr_matrix: One TF-IDF row per text.
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            counts = Counter(
+                self.vocabulary_[term] for term in self._analyze(text) if term in self.vocabulary_
+            )
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(texts), self.n_features_in_)
+        )
+        matrix.sort_indices()
+
+        if self.meta['binary']:
+            matrix.data[:] = 1.0
+        elif self.meta['sublinear_tf']:
+            np.log(matrix.data, out=matrix.data)
+            matrix.data += 1.0
+        if self.meta['use_idf']:
+            matrix.data *= np.asarray(self.idf_)[matrix.indices]
+
+        norm = self.meta['norm']
+        if norm:
+            if norm == 'l1':
+                row_norms = np.asarray(abs(matrix).sum(axis=1)).ravel()
+            else:
+                row_norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            row_norms[row_norms == 0] = 1.0
+            matrix = sparse.diags(1.0 / row_norms) @ matrix
+        return matrix.tocsr()
+
+    def decision_function(self, X):
+        return np.asarray(X @ self.coef_.T) + self.intercept_
+
+    def predict_proba(self, X):
+        """
+        Equivalent of the source classifier's predict_proba.
+        """
+        return _scores_to_proba(self.decision_function(X), self.meta['probability'])
+
+def export_from_pickles(model_dir):
+    """
+    Exports the joblib artifacts in `model_dir` to `model_dir/compact`.
+    """
+    import joblib
+    vectorizer_path = os.path.join(model_dir, 'tfidf_vectorizer.pkl')
+    classifier_path = os.path.join(model_dir, 'intent_classifier.pkl')
+    export_compact_model(
+        joblib.load(vectorizer_path),
+        joblib.load(classifier_path),
+        os.path.join(model_dir, 'compact'),
+        source_digests={
+            'tfidf_vectorizer.pkl': file_digest(vectorizer_path),
+            'intent_classifier.pkl': file_digest(classifier_path)
+        }
+    )
+
+if __name__ == "__main__":
+    # python -m chatbot.compact_model [model_dir]
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else default_dir
+    export_from_pickles(target_dir)
+    print(f"Exported compact model to {os.path.join(target_dir, 'compact')}")
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import logging
+import os
+from utils.text_processor import PREPROCESS_VERSION, preprocess_many
+
+logger = logging.getLogger(__name__)
+
+def pattern_key(pattern):
+    """
+    Cache key of a raw pattern; changes with PREPROCESS_VERSION, so cached
+    output of an older preprocessing step is never reused.
+    """
+    return hashlib.sha1(f"{PREPROCESS_VERSION}\0{pattern}".encode('utf-8')).hexdigest()
+
+class PreprocessedPatternCache:
+    """
+    On-disk cache of preprocessed training patterns, keyed by pattern hash.
+
+    Retraining after an edit only runs NLTK on patterns it has not seen.
+    save() keeps just the entries used since load(), so patterns removed
+    from the corpus drop out of the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._used = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable preprocessing cache {self.path}: {e}")
+            return
+        if data.get('preprocess_version') == PREPROCESS_VERSION:
+            self._entries = data.get('patterns', {})
+
+    def preprocess_all(self, patterns):
+        """
+        Returns the preprocessed patterns in input order. Only patterns
+        missing from the cache are preprocessed, in one preprocess_many()
+        call so a large edit is spread over worker processes.
+        """
+        keys = [pattern_key(pattern) for pattern in patterns]
+        missing = {}
+        for key, pattern in zip(keys, patterns):
+            if key not in self._entries and key not in missing:
+                missing[key] = pattern
+
+        if missing:
+            self._entries.update(zip(missing, preprocess_many(list(missing.values()))))
+        self.misses += len(missing)
+        self.hits += len(patterns) - len(missing)
+
+        for key in keys:
+            self._used[key] = self._entries[key]
+        return [self._entries[key] for key in keys]
+
+    def save(self):
+        """
+        Writes the entries used since load(); failures only cost the cache.
+        """
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'preprocess_version': PREPROCESS_VERSION, 'patterns': self._used}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write preprocessing cache {self.path}: {e}")
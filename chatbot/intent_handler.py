@@ -2,10 +2,14 @@ import logging
 import json
 import os
 import random
+import threading
+import time
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from chatbot.ml_intent_classifier import MLIntentClassifier
 from chatbot.context_manager import ContextManager
+from chatbot.pattern_index import PatternIndex
+from chatbot.shared_arrays import shared_matrix, cache_key
+from utils.text_processor import PREPROCESS_VERSION
 from config import Config
 
 # Configure logging
@@ -18,27 +22,47 @@ class IntentHandler:
         self.confidence_threshold = 0.60
         self.nlp = None
         self.training_data = self.load_training_data()
+        # Index over normalized spaCy pattern vectors and their intent labels
+        self.pattern_index = None
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.index_path = os.path.join(base_dir, 'model', 'pattern_index_spacy.pkl')
+        # Serializes reloads; requests never take this lock
+        self._reload_lock = threading.Lock()
         
-        # Try to load spaCy for semantic similarity
+        if Config.SPACY_ENABLED:
+            self.nlp = self.load_spacy()
+        else:
+            logger.info("spaCy disabled by configuration. Will fallback to TF-IDF similarity.")
+
+        if self.nlp and Config.SHARED_ARRAYS_ENABLED:
+            self.share_vector_table()
+        self.pattern_index = self.build_pattern_vectors(self.training_data)
+
+    def load_spacy(self):
+        """
+        Loads a spaCy model for semantic similarity (en_core_web_md, then
+        en_core_web_sm), or returns None if neither is available.
+        """
         try:
             import spacy
             try:
                 # Try to load the requested model
-                self.nlp = spacy.load("en_core_web_md")
+                nlp = spacy.load("en_core_web_md")
                 logger.info("spaCy en_core_web_md loaded successfully.")
+                return nlp
             except OSError:
                 logger.warning("spaCy model 'en_core_web_md' not found. Trying 'en_core_web_sm'.")
                 try:
-                    self.nlp = spacy.load("en_core_web_sm")
+                    nlp = spacy.load("en_core_web_sm")
                     logger.info("spaCy en_core_web_sm loaded successfully.")
+                    return nlp
                 except:
                     logger.warning("spaCy models not found. Will fallback to TF-IDF similarity.")
-                    self.nlp = None
         except ImportError:
             logger.warning("spaCy not installed. Will fallback to TF-IDF similarity.")
         except Exception as e:
             logger.warning(f"spaCy init error: {e}")
-            self.nlp = None
+        return None
 
     def load_training_data(self):
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -50,9 +74,122 @@ class IntentHandler:
             logger.error(f"Failed to load training data: {e}")
             return {"intents": []}
 
+    def _spacy_model_id(self):
+        meta = self.nlp.meta
+        return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+    def share_vector_table(self):
+        """
+        Replaces the spaCy vector table, the bulk of en_core_web_md's memory,
+        with a read-only memory-mapped copy shared by all worker processes.
+        """
+        vectors = self.nlp.vocab.vectors
+        if vectors.mode != 'default' or not isinstance(vectors.data, np.ndarray) or not vectors.data.size:
+            return
+        try:
+            key = cache_key(self._spacy_model_id(), vectors.data.shape, vectors.data.dtype)
+            table, _ = shared_matrix(
+                Config.SHARED_ARRAY_DIR,
+                'spacy_vectors',
+                key,
+                lambda: (vectors.data, None)
+            )
+            vectors.data = table
+        except Exception as e:
+            logger.warning(f"Could not share the spaCy vector table: {e}")
+
+    def build_pattern_vectors(self, training_data):
+        """
+        Precomputes unit-length spaCy vectors for every training pattern, so the
+        semantic fallback only has to embed the user query. With
+        Config.SHARED_ARRAYS_ENABLED the matrix comes from the shared array
+        cache and only the first worker process runs spaCy over the patterns.
+
+        Returns:
+            PatternIndex: Index over the vectors, or None without spaCy.
+        """
+        if not self.nlp:
+            return None
+
+        try:
+            if Config.SHARED_ARRAYS_ENABLED:
+                key = cache_key(
+                    self._spacy_model_id(),
+                    json.dumps(training_data, sort_keys=True),
+                    PREPROCESS_VERSION
+                )
+                vectors, labels = shared_matrix(
+                    Config.SHARED_ARRAY_DIR,
+                    'spacy_patterns',
+                    key,
+                    lambda: self._embed_patterns(training_data)
+                )
+            else:
+                vectors, labels = self._embed_patterns(training_data)
+        except Exception as e:
+            logger.error(f"Failed to build pattern vectors: {e}")
+            return None
+
+        pattern_index = None
+        if vectors is not None:
+            pattern_index = PatternIndex(
+                vectors,
+                labels,
+                mode=Config.SEMANTIC_INDEX_MODE,
+                nlist=Config.SEMANTIC_INDEX_NLIST,
+                nprobe=Config.SEMANTIC_INDEX_NPROBE
+            ).build(self.index_path)
+            logger.info(f"Loaded {len(pattern_index)} spaCy pattern vectors.")
+        return pattern_index
+
+    def _embed_patterns(self, training_data):
+        """
+        Returns (unit-length pattern vectors, labels), or (None, None) if no
+        pattern has a vector.
+        """
+        tags = []
+        patterns = []
+        for intent in training_data.get('intents', []):
+            for pattern in intent.get('patterns', []):
+                tags.append(intent['tag'])
+                patterns.append(pattern)
+
+        vectors = []
+        labels = []
+        for tag, doc in zip(tags, self.nlp.pipe(patterns)):
+            # Patterns without a vector can never match, so skip them
+            if doc.vector_norm == 0:
+                continue
+            vectors.append(doc.vector / doc.vector_norm)
+            labels.append(tag)
+
+        if not vectors:
+            return None, None
+        logger.info(f"Built {len(labels)} spaCy pattern vectors.")
+        return np.vstack(vectors).astype(np.float32), labels
+
+    def reload(self):
+        """
+        Hot-reloads training data and model artifacts after a retrain.
+
+        Everything derived from them is built first and then swapped in by
+        reference, so requests already in flight finish on the old model and
+        no request ever sees a half-built one.
+        """
+        with self._reload_lock:
+            training_data = self.load_training_data()
+            pattern_index = self.build_pattern_vectors(training_data)
+            self.ml_classifier.load_model()
+            self.training_data = training_data
+            self.pattern_index = pattern_index
+            logger.info("Intent models reloaded.")
+
     def get_semantic_match(self, user_query):
         """
         Fallback layer: Uses spaCy embeddings (or TF-IDF) to find best match.
+
+        Returns:
+            tuple: (matched_intent or None, best_similarity)
         """
         best_score = 0
         best_intent = None
@@ -63,18 +200,13 @@ class IntentHandler:
                 user_doc = self.nlp(user_query)
                 # Check if vector is valid (not empty/zero)
                 if user_doc.vector_norm == 0:
-                    return None
-                    
-                for intent in self.training_data['intents']:
-                    for pattern in intent['patterns']:
-                        pattern_doc = self.nlp(pattern)
-                        if pattern_doc.vector_norm == 0:
-                            continue
-                            
-                        similarity = user_doc.similarity(pattern_doc)
-                        if similarity > best_score:
-                            best_score = similarity
-                            best_intent = intent['tag']
+                    return None, 0.0
+
+                pattern_index = self.pattern_index
+                if pattern_index is not None:
+                    # Cosine similarity against the indexed pattern vectors
+                    query_vector = (user_doc.vector / user_doc.vector_norm).astype(np.float32)
+                    best_intent, best_score = pattern_index.search(query_vector)
             except Exception as e:
                 logger.error(f"spaCy similarity error: {e}")
 
@@ -83,38 +215,33 @@ class IntentHandler:
         # But if spaCy is missing (self.nlp is None), we use TF-IDF.
         if not self.nlp and self.ml_classifier.vectorizer:
             try:
-                # Preprocess
-                processed_query = self.ml_classifier.trainer.preprocess_text(user_query)
-                if processed_query:
-                    user_vec = self.ml_classifier.vectorizer.transform([processed_query])
-                    
-                    for intent in self.training_data['intents']:
-                        for pattern in intent['patterns']:
-                            processed_pattern = self.ml_classifier.trainer.preprocess_text(pattern)
-                            if processed_pattern:
-                                pattern_vec = self.ml_classifier.vectorizer.transform([processed_pattern])
-                                
-                                # Compute cosine similarity
-                                similarity = cosine_similarity(user_vec, pattern_vec)[0][0]
-                                if similarity > best_score:
-                                    best_score = similarity
-                                    best_intent = intent['tag']
+                best_intent, best_score = self.ml_classifier.match_pattern(user_query)
             except Exception as e:
                 logger.error(f"TF-IDF similarity error: {e}")
 
         # Threshold for semantic match
         # If using TF-IDF, values might be lower/higher than spaCy. 0.4 is a safe conservative bet.
         if best_score > 0.4: 
-            return best_intent
-        return None
+            return best_intent, float(best_score)
+        return None, float(best_score)
 
-    def detect_intent(self, user_message, user_id=None):
+    def detect_intent(self, user_message, user_id=None, ml_prediction=None):
         """
         Hybrid Intent Resolution Flow.
         Args:
             user_message (str): The user's input.
             user_id (str, optional): User ID for context lookup.
+            ml_prediction (tuple, optional): Precomputed (intent, confidence) from
+                the ML classifier, e.g. from a batched call. Predicted here if omitted.
+
+        Returns:
+            dict: 'intent', 'confidence', the resolution 'stage' that produced it
+                  ('keyword', 'ml', 'semantic' or 'unknown') and per-stage
+                  'timings' in milliseconds.
         """
+        timings = {}
+        stage_start = time.perf_counter()
+
         normalized = (user_message or "").lower().strip()
         keyword_intents = {
             "who are you": "about",
@@ -123,27 +250,67 @@ class IntentHandler:
         }
         for phrase, tag in keyword_intents.items():
             if phrase in normalized:
-                return tag
+                timings['keyword'] = (time.perf_counter() - stage_start) * 1000
+                return self._intent_result(tag, 1.0, 'keyword', timings)
+        timings['keyword'] = (time.perf_counter() - stage_start) * 1000
 
         # 1. ML Prediction
-        intent, confidence = self.ml_classifier.predict(user_message)
+        stage_start = time.perf_counter()
+        if ml_prediction is not None:
+            intent, confidence = ml_prediction
+        else:
+            intent, confidence = self.ml_classifier.predict(user_message)
+        timings['ml'] = (time.perf_counter() - stage_start) * 1000
         logger.info(f"ML Prediction: {intent}, Confidence: {confidence}")
         
         final_intent = intent
+        final_confidence = confidence
+        stage = 'ml'
         
         # 2. Fallback if confidence is low
         if confidence < self.confidence_threshold:
             logger.info(f"Low confidence ({confidence}). Attempting semantic fallback.")
-            semantic_intent = self.get_semantic_match(user_message)
+            stage_start = time.perf_counter()
+            semantic_intent, semantic_score = self.get_semantic_match(user_message)
+            timings['semantic'] = (time.perf_counter() - stage_start) * 1000
             if semantic_intent:
                 final_intent = semantic_intent
+                final_confidence = semantic_score
+                stage = 'semantic'
                 logger.info(f"Semantic Fallback found: {final_intent}")
             else:
                 if confidence < 0.3 and intent is None:
                     final_intent = 'unknown'
+                    stage = 'unknown'
 
         # 3. Context (Optional usage for resolution)
         # In a real hybrid system, we would use context to disambiguate here.
         # For now, we just ensure context is updated later (in processor or explicit call).
         
-        return final_intent
+        return self._intent_result(final_intent, final_confidence, stage, timings)
+
+    def warm_up(self, queries):
+        """
+        Runs sample queries through every resolution stage, including the
+        ones detect_intent would skip, so lazily initialized state (the
+        preprocessing cache, the vectorizer, spaCy's pipeline) is built before
+        real traffic arrives.
+
+        Returns:
+            list: The intent detected for each query.
+        """
+        intents = []
+        for query in queries:
+            intents.append(self.detect_intent(query)['intent'])
+            self.ml_classifier.predict(query)
+            self.ml_classifier.predict_batch([query])
+            self.get_semantic_match(query)
+        return intents
+
+    def _intent_result(self, intent, confidence, stage, timings):
+        return {
+            'intent': intent,
+            'confidence': min(float(confidence), 1.0),
+            'stage': stage,
+            'timings': {name: round(ms, 3) for name, ms in timings.items()}
+        }
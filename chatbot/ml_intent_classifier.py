@@ -1,38 +1,215 @@
+import io
 import os
+import json
+import hashlib
 import joblib
 import numpy as np
-from chatbot.train_intent_model import IntentModelTrainer
+from chatbot.train_intent_model import load_training_corpus
+from chatbot.compact_model import CompactIntentModel, read_compact_meta, file_digest
+from chatbot.pattern_index import PatternIndex, l2_normalize
+from chatbot.shared_arrays import shared_matrix, cache_key
+from utils.text_processor import preprocess_text, PREPROCESS_VERSION
+from config import Config
+
+class IntentModel:
+    """
+    A loaded vectorizer/classifier pair together with the pattern index
+    derived from it. Never mutated after construction, so a reload can
+    replace all three with a single reference swap.
+    """
+    def __init__(self, vectorizer, classifier, pattern_index, signature):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.pattern_index = pattern_index
+        # (mtime_ns, size) of the artifact files this model was loaded from
+        self.signature = signature
+        # 'compact' (flat arrays, no sklearn) or 'joblib' (pickled sklearn objects)
+        self.format = 'compact' if isinstance(classifier, CompactIntentModel) else 'joblib'
 
 class MLIntentClassifier:
     """
-    Predicts intent using the trained TF-IDF + Logistic Regression model.
+    Predicts intent using the trained model (TF-IDF + Logistic Regression,
+    or hashed features + SGD, see Config.FEATURE_MODE).
+
+    Config.MODEL_FORMAT selects the artifacts: 'compact' loads the memory-mapped
+    flat-array export, 'joblib' the pickled sklearn objects, and 'auto' (the
+    default) prefers the export when it was made from the current pickles.
     """
     def __init__(self):
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.model_dir = os.path.join(self.base_dir, 'model')
         self.vectorizer_path = os.path.join(self.model_dir, 'tfidf_vectorizer.pkl')
         self.classifier_path = os.path.join(self.model_dir, 'intent_classifier.pkl')
+        self.compact_dir = os.path.join(self.model_dir, 'compact')
+        self.index_path = os.path.join(self.model_dir, 'pattern_index_tfidf.pkl')
+        self.data_path = os.path.join(self.base_dir, '..', 'data', 'training_data.json')
         
-        self.vectorizer = None
-        self.classifier = None
-        # We reuse the trainer's preprocessing to ensure consistency
-        self.trainer = IntentModelTrainer()
+        # The currently served IntentModel; replaced atomically by load_model()
+        self.model = None
         
         self.load_model()
 
+    @property
+    def vectorizer(self):
+        model = self.model
+        return model.vectorizer if model else None
+
+    @property
+    def classifier(self):
+        model = self.model
+        return model.classifier if model else None
+
+    @property
+    def pattern_index(self):
+        """
+        Index over the TF-IDF vectors of all training patterns (semantic fallback).
+        """
+        model = self.model
+        return model.pattern_index if model else None
+
+    def artifact_signature(self):
+        """
+        Returns the (mtime_ns, size) of both artifact files and of the compact
+        export's meta.json, or None if a pickle is missing.
+        """
+        try:
+            stats = [os.stat(self.vectorizer_path), os.stat(self.classifier_path)]
+        except OSError:
+            return None
+        try:
+            stats.append(os.stat(os.path.join(self.compact_dir, 'meta.json')))
+        except OSError:
+            pass
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    def artifacts_changed(self):
+        """
+        True if the artifact files on disk differ from the ones being served.
+        """
+        signature = self.artifact_signature()
+        model = self.model
+        return signature is not None and (model is None or model.signature != signature)
+
     def load_model(self):
         """
-        Loads the saved vectorizer and classifier artifacts.
+        Loads the saved vectorizer and classifier artifacts and builds their
+        pattern index, then swaps them in as one IntentModel. Requests that
+        already picked up the previous model finish on it undisturbed.
+        
+        Returns:
+            bool: True if a new model was loaded.
         """
-        if not os.path.exists(self.vectorizer_path) or not os.path.exists(self.classifier_path):
+        signature = self.artifact_signature()
+        if signature is None:
             print(f"Error: Model files not found in {self.model_dir}")
-            return
+            return False
 
         try:
-            self.vectorizer = joblib.load(self.vectorizer_path)
-            self.classifier = joblib.load(self.classifier_path)
+            vectorizer, classifier, vectorizer_digest = self._load_artifacts()
         except Exception as e:
             print(f"Error loading model: {e}")
+            return False
+
+        # The two files are written one after the other by a retrain; refuse a
+        # half-written pair and keep serving the old model until both are new
+        n_features = getattr(classifier, 'n_features_in_', None)
+        vocabulary = getattr(vectorizer, 'vocabulary_', None)
+        # Hashing vectorizers have no vocabulary, only a fixed width
+        vectorizer_width = len(vocabulary) if vocabulary is not None else getattr(vectorizer, 'n_features', None)
+        if n_features is not None and vectorizer_width is not None and n_features != vectorizer_width:
+            print("Error loading model: vectorizer and classifier artifacts do not match")
+            return False
+
+        pattern_index = self.build_pattern_index(vectorizer, vectorizer_digest)
+        self.model = IntentModel(vectorizer, classifier, pattern_index, signature)
+        return True
+
+    def _load_artifacts(self):
+        """
+        Returns (vectorizer, classifier, vectorizer_digest) in the configured
+        MODEL_FORMAT. The digest identifies the vectorizer that was actually
+        loaded, even if a retrain replaces the files meanwhile.
+        """
+        model_format = Config.MODEL_FORMAT
+        if model_format == 'compact' or (model_format == 'auto' and self._compact_is_current()):
+            compact_model = CompactIntentModel.load(self.compact_dir)
+            meta_digest = hashlib.sha1(json.dumps(compact_model.meta, sort_keys=True).encode('utf-8')).hexdigest()
+            return compact_model, compact_model, meta_digest
+
+        with open(self.vectorizer_path, 'rb') as f:
+            payload = f.read()
+        vectorizer = joblib.load(io.BytesIO(payload))
+        return vectorizer, joblib.load(self.classifier_path), hashlib.sha1(payload).hexdigest()
+
+    def _compact_is_current(self):
+        """
+        True if the compact export was made from the pickles now on disk.
+        """
+        meta = read_compact_meta(self.compact_dir)
+        if meta is None:
+            return False
+        digests = meta.get('source_digests', {})
+        return (
+            digests.get('tfidf_vectorizer.pkl') == file_digest(self.vectorizer_path)
+            and digests.get('intent_classifier.pkl') == file_digest(self.classifier_path)
+        )
+
+    def build_pattern_index(self, vectorizer, vectorizer_digest=None):
+        """
+        Builds the TF-IDF vectors of all preprocessed training patterns as one
+        sparse matrix with L2-normalized rows, wrapped in a PatternIndex.
+
+        With Config.SHARED_ARRAYS_ENABLED the matrix is memory-mapped from the
+        shared array cache, keyed by the training data and vectorizer, so only
+        the first worker process pays for building it.
+        """
+        def build():
+            patterns, labels = load_training_corpus(self.data_path)
+            if not patterns:
+                return None, None
+            return l2_normalize(vectorizer.transform(patterns)), labels
+
+        try:
+            if Config.SHARED_ARRAYS_ENABLED and vectorizer_digest:
+                # Patterns pass through preprocess_text, so its version is part of the key
+                key = cache_key(file_digest(self.data_path), vectorizer_digest, PREPROCESS_VERSION)
+                pattern_matrix, labels = shared_matrix(Config.SHARED_ARRAY_DIR, 'tfidf_patterns', key, build)
+            else:
+                pattern_matrix, labels = build()
+            if pattern_matrix is None:
+                return None
+            return PatternIndex(
+                pattern_matrix,
+                labels,
+                mode=Config.SEMANTIC_INDEX_MODE,
+                nlist=Config.SEMANTIC_INDEX_NLIST,
+                nprobe=Config.SEMANTIC_INDEX_NPROBE
+            ).build(self.index_path)
+        except Exception as e:
+            print(f"Error building pattern matrix: {e}")
+            return None
+
+    def match_pattern(self, text):
+        """
+        Finds the training pattern most similar to the given text.
+
+        Args:
+            text (str): The user's input text.
+
+        Returns:
+            tuple: (intent_of_best_pattern, cosine_similarity)
+        """
+        model = self.model
+        if model is None or model.pattern_index is None:
+            return None, 0.0
+
+        processed_text = preprocess_text(text)
+        if not processed_text:
+            return None, 0.0
+
+        # With unit-length rows, dot products are cosine similarities
+        query_vector = l2_normalize(model.vectorizer.transform([processed_text]))
+        return model.pattern_index.search(query_vector)
 
     def predict(self, text):
         """
@@ -44,29 +221,69 @@ class MLIntentClassifier:
         Returns:
             tuple: (predicted_intent, confidence_score)
         """
-        if not self.vectorizer or not self.classifier:
+        model = self.model
+        if model is None:
             return None, 0.0
             
         # Preprocess using the same logic as training
-        processed_text = self.trainer.preprocess_text(text)
+        processed_text = preprocess_text(text)
         
         if not processed_text:
             return None, 0.0
             
         try:
             # Transform text to vector
-            vectorized_text = self.vectorizer.transform([processed_text])
+            vectorized_text = model.vectorizer.transform([processed_text])
             
             # Get probabilities
-            probabilities = self.classifier.predict_proba(vectorized_text)[0]
+            probabilities = model.classifier.predict_proba(vectorized_text)[0]
             
             # Find max probability
             max_prob_index = np.argmax(probabilities)
             confidence = probabilities[max_prob_index]
-            intent = self.classifier.classes_[max_prob_index]
+            intent = model.classifier.classes_[max_prob_index]
             
             return intent, float(confidence)
             
         except Exception as e:
             print(f"Prediction error: {e}")
             return None, 0.0
+
+    def predict_batch(self, texts, top_k=1):
+        """
+        Predicts the top-k intents for many texts with a single vectorize and
+        predict_proba call.
+        
+        Args:
+            texts (list): The input texts.
+            top_k (int): Number of intents to return per text.
+            
+        Returns:
+            list: One list of (intent, probability) pairs per text, best first.
+                  Texts that are empty after preprocessing get an empty list.
+        """
+        results = [[] for _ in texts]
+        model = self.model
+        if model is None:
+            return results
+
+        processed_texts = [preprocess_text(text) for text in texts]
+        rows = [i for i, processed_text in enumerate(processed_texts) if processed_text]
+        if not rows:
+            return results
+
+        try:
+            vectorized_texts = model.vectorizer.transform([processed_texts[i] for i in rows])
+            probabilities = model.classifier.predict_proba(vectorized_texts)
+        except Exception as e:
+            print(f"Batch prediction error: {e}")
+            return results
+
+        top_k = max(1, min(top_k, probabilities.shape[1]))
+        top_indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+        for row, i in enumerate(rows):
+            results[i] = [
+                (str(model.classifier.classes_[j]), float(probabilities[row, j]))
+                for j in top_indices[row]
+            ]
+        return results
@@ -0,0 +1,263 @@
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+import joblib
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import aliased
+
+from database.db_handler import get_db_session
+from database.models import Feedback, Message
+from chatbot.compact_model import file_digest
+from chatbot.corpus_cache import PreprocessedPatternCache
+from chatbot.train_intent_model import load_training_corpus
+from utils.text_processor import preprocess_text
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Detected intents that never make a training label
+_NON_LABELS = {'unknown', 'error'}
+
+# A run holding the lock file longer than this belongs to a dead process
+LOCK_STALE_SECONDS = 600
+
+class OnlineLearner:
+    """
+    Incremental model updates from conversations users or admins vouched for.
+
+    Each run_once() collects the feedback recorded since the last run: the
+    admin's confirmed_intent where set, otherwise the intent detected for
+    the message when its rating is at least ONLINE_MIN_RATING. Once
+    ONLINE_MIN_SAMPLES examples are waiting, they are mixed with a sample of
+    training patterns and applied with one partial_fit call to the served
+    classifier. The result is written as a versioned checkpoint and then
+    published as intent_classifier.pkl, where the hot-reload watcher of every
+    worker picks it up.
+
+    A full retrain replaces the classifier these updates were applied to, so
+    once the served classifier is no longer the last one published here, the
+    watermark is reset and all feedback is applied again to the new model.
+
+    Only classifiers with partial_fit (FEATURE_MODE=hashing) can be updated,
+    and only with intents they already know; new intents need a retrain.
+    Every server worker may schedule runs: a lock file in the model directory
+    lets one run at a time, so each feedback row is applied once.
+    """
+    def __init__(self, model_dir=None, state_path=None):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.model_dir = model_dir or os.path.join(base_dir, 'model')
+        self.state_path = state_path or Config.ONLINE_STATE_PATH
+        self.data_path = os.path.join(base_dir, '..', 'data', 'training_data.json')
+        self.vectorizer_path = os.path.join(self.model_dir, 'tfidf_vectorizer.pkl')
+        self.classifier_path = os.path.join(self.model_dir, 'intent_classifier.pkl')
+        self.lock_path = os.path.join(self.model_dir, 'online_learning.lock')
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self.last_result = None
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'watermark': 0, 'updates': 0, 'samples': 0, 'version': None}
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def stats(self):
+        state = self.load_state()
+        state['last_result'] = self.last_result
+        return state
+
+    def collect_examples(self, watermark, limit):
+        """
+        Reads up to `limit` usable feedback rows with ids above `watermark`,
+        oldest first.
+
+        Returns:
+            tuple: ((text, intent) examples, last feedback id read, rows read)
+        """
+        # Feedback on a reply applies to the user message it answered: the
+        # latest earlier user message of the same conversation
+        answered = aliased(Message)
+        user_message = aliased(Message)
+        user_message_id = case(
+            (Message.sender == 'user', Message.id),
+            else_=(
+                select(func.max(answered.id))
+                .where(
+                    answered.conversation_id == Message.conversation_id,
+                    answered.sender == 'user',
+                    answered.id < Message.id
+                )
+                .correlate(Message)
+                .scalar_subquery()
+            )
+        )
+
+        db_session = get_db_session()
+        try:
+            rows = (
+                db_session.query(Feedback, user_message)
+                .join(Message, Feedback.message_id == Message.id)
+                .outerjoin(user_message, user_message.id == user_message_id)
+                .filter(Feedback.id > watermark)
+                .filter((Feedback.confirmed_intent.isnot(None)) | (Feedback.rating >= Config.ONLINE_MIN_RATING))
+                .order_by(Feedback.id)
+                .limit(limit)
+                .all()
+            )
+
+            examples = []
+            for feedback, user_message in rows:
+                if user_message is None:
+                    continue
+                label = feedback.confirmed_intent or user_message.intent
+                if label and label not in _NON_LABELS:
+                    examples.append((user_message.content, label))
+            return examples, (rows[-1][0].id if rows else watermark), len(rows)
+        finally:
+            db_session.close()
+
+    def run_once(self):
+        """
+        Applies one update if enough new examples are waiting.
+
+        Returns:
+            dict: 'status' ('updated', 'waiting', 'unsupported', 'busy' or
+                  'conflict') plus the sample counts and checkpoint version.
+        """
+        if not self._lock.acquire(blocking=False):
+            return {'status': 'busy'}
+        try:
+            token = self._acquire_file_lock()
+            if token is None:
+                return {'status': 'busy'}
+            try:
+                self.last_result = self._run()
+                return self.last_result
+            finally:
+                self._release_file_lock(token)
+        finally:
+            self._lock.release()
+
+    def _acquire_file_lock(self):
+        """
+        Creates the lock file shared by all processes; returns its token, or
+        None if another process holds it.
+        """
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) <= LOCK_STALE_SECONDS:
+                        return None
+                    logger.warning(f"Removing stale online learning lock {self.lock_path}")
+                    os.remove(self.lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(token)
+            return token
+        return None
+
+    def _release_file_lock(self, token):
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                if f.read().strip() != token:
+                    return
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+    def _run(self):
+        vectorizer_digest = file_digest(self.vectorizer_path)
+        classifier_digest = file_digest(self.classifier_path)
+        vectorizer = joblib.load(self.vectorizer_path)
+        classifier = joblib.load(self.classifier_path)
+        if not hasattr(classifier, 'partial_fit'):
+            return {'status': 'unsupported', 'reason': f"{type(classifier).__name__} has no partial_fit"}
+
+        state = self.load_state()
+        if state.get('published_digest') and state['published_digest'] != classifier_digest:
+            logger.info("Classifier was retrained since the last online update; reapplying all feedback")
+            state['watermark'] = 0
+            state['published_digest'] = None
+        examples, last_id, fetched = self.collect_examples(state['watermark'], Config.ONLINE_MAX_SAMPLES)
+
+        known = set(classifier.classes_)
+        X = []
+        y = []
+        for text, label in examples:
+            cleaned = preprocess_text(text)
+            if cleaned and label in known:
+                X.append(cleaned)
+                y.append(label)
+
+        # A full page of unusable feedback must not hold the watermark back forever
+        page_full = fetched >= Config.ONLINE_MAX_SAMPLES
+        if len(X) < Config.ONLINE_MIN_SAMPLES and not page_full:
+            return {'status': 'waiting', 'samples': len(X)}
+
+        new_samples = len(X)
+        if X:
+            rehearsal = int(new_samples * Config.ONLINE_REHEARSAL_RATIO)
+            if rehearsal:
+                cache = PreprocessedPatternCache(os.path.join(self.model_dir, 'preprocessed_patterns.json'))
+                patterns, labels = load_training_corpus(self.data_path, preprocess_all=cache.preprocess_all)
+                candidates = [i for i, label in enumerate(labels) if label in known]
+                for i in self._rng.sample(candidates, min(rehearsal, len(candidates))):
+                    X.append(patterns[i])
+                    y.append(labels[i])
+            classifier.partial_fit(vectorizer.transform(X), y)
+
+            # A retrain that replaced the artifacts meanwhile wins
+            if (file_digest(self.vectorizer_path), file_digest(self.classifier_path)) != (vectorizer_digest, classifier_digest):
+                return {'status': 'conflict', 'samples': new_samples}
+            version = self._publish(classifier)
+            state['version'] = version
+            state['published_digest'] = file_digest(self.classifier_path)
+            state['updates'] = state.get('updates', 0) + 1
+            state['samples'] = state.get('samples', 0) + new_samples
+
+        state['watermark'] = last_id
+        state['last_update_at'] = datetime.now().isoformat()
+        self._save_state(state)
+        if not new_samples:
+            return {'status': 'waiting', 'samples': 0}
+        logger.info(f"Online update {state['version']} applied {new_samples} new samples ({len(X) - new_samples} rehearsed)")
+        return {'status': 'updated', 'samples': new_samples, 'rehearsal': len(X) - new_samples, 'version': state['version']}
+
+    def _publish(self, classifier):
+        """
+        Writes a versioned checkpoint, then replaces the served classifier
+        with it; both by rename, so no reader sees a partial file.
+        """
+        version = datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoint_path = os.path.join(self.model_dir, f"intent_classifier_online_{version}.pkl")
+        for path in (checkpoint_path, self.classifier_path):
+            tmp_path = f"{path}.tmp"
+            joblib.dump(classifier, tmp_path)
+            os.replace(tmp_path, path)
+
+        checkpoints = sorted(glob.glob(os.path.join(self.model_dir, 'intent_classifier_online_*.pkl')))
+        for path in checkpoints[:-max(1, Config.ONLINE_KEEP_CHECKPOINTS)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old checkpoint {path}: {e}")
+        return version
@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import os
+import joblib
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Below this many patterns a full scan is already cheap, so IVF is not built
+IVF_MIN_PATTERNS = 1000
+
+
+def _scores(matrix, query):
+    """
+    Dot product of every row in `matrix` (dense or sparse) with `query`
+    (a dense 1-D vector or a 1 x d sparse row), returned as a flat array.
+    """
+    result = matrix @ query.T if sparse.issparse(query) else matrix @ query
+    if sparse.issparse(result):
+        result = result.toarray()
+    return np.asarray(result).ravel()
+
+
+def l2_normalize(matrix):
+    """
+    Scales every row of a dense or sparse matrix to unit L2 norm (zero rows
+    are left as they are).
+    """
+    if sparse.issparse(matrix):
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+    return _normalize_rows(np.asarray(matrix, dtype=np.float64))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class PatternIndex:
+    """
+    Nearest-neighbour index over unit-length pattern vectors.
+
+    In 'brute' mode every pattern is scored. In 'ivf' mode the patterns are
+    clustered with spherical k-means into `nlist` inverted lists and a query
+    only scans the `nprobe` lists whose centroids are closest, trading a
+    little recall for a much smaller scan. Raising `nprobe` moves the
+    trade-off back towards recall; nprobe == nlist is an exact search.
+    """
+    def __init__(self, vectors, labels, mode='brute', nlist=0, nprobe=8):
+        self.vectors = vectors
+        self.labels = np.asarray(labels)
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+
+        if self.mode == 'ivf' and len(self.labels) < IVF_MIN_PATTERNS:
+            logger.info(f"Only {len(self.labels)} patterns; using brute-force search instead of IVF.")
+            self.mode = 'brute'
+
+    def __len__(self):
+        return len(self.labels)
+
+    def fingerprint(self):
+        """
+        Content hash of the indexed vectors and labels, used to detect a stale
+        persisted index.
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((self.vectors.shape, self.nlist)).encode('utf-8'))
+        if sparse.issparse(self.vectors):
+            for array in (self.vectors.data, self.vectors.indices, self.vectors.indptr):
+                digest.update(np.ascontiguousarray(array).tobytes())
+        else:
+            digest.update(np.ascontiguousarray(self.vectors).tobytes())
+        digest.update('\n'.join(self.labels.tolist()).encode('utf-8'))
+        return digest.hexdigest()
+
+    def build(self, index_path=None, iterations=10, seed=42):
+        """
+        Builds the IVF lists, reusing the persisted ones at `index_path` when
+        they were built from identical vectors. No-op in brute mode.
+        """
+        if self.mode != 'ivf':
+            return self
+
+        fingerprint = self.fingerprint()
+        if index_path and self._load(index_path, fingerprint):
+            logger.info(f"Loaded IVF index from {index_path}")
+            return self
+
+        n_patterns = len(self.labels)
+        nlist = self.nlist or int(np.sqrt(n_patterns))
+        nlist = max(1, min(nlist, n_patterns))
+
+        rng = np.random.default_rng(seed)
+        seeds = rng.choice(n_patterns, size=nlist, replace=False)
+        centroids = self._dense_rows(seeds)
+
+        assignments = None
+        for _ in range(iterations):
+            centroids = _normalize_rows(centroids)
+            similarities = self.vectors @ centroids.T
+            assignments = np.asarray(similarities).argmax(axis=1)
+            for list_no in range(nlist):
+                members = np.flatnonzero(assignments == list_no)
+                if len(members):
+                    centroids[list_no] = np.asarray(self.vectors[members].mean(axis=0)).ravel()
+
+        self.centroids = _normalize_rows(centroids).astype(np.float32)
+        self.list_ids = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.nlist = nlist
+
+        if index_path:
+            self._save(index_path, fingerprint)
+        logger.info(f"Built IVF index with {nlist} lists over {n_patterns} patterns.")
+        return self
+
+    def search(self, query, exact=False):
+        """
+        Finds the indexed pattern most similar to a unit-length query vector.
+
+        Args:
+            query: Dense 1-D vector or 1 x d sparse row.
+            exact (bool): Force a brute-force scan, regardless of mode.
+
+        Returns:
+            tuple: (label_of_best_pattern, similarity)
+        """
+        if not len(self.labels):
+            return None, 0.0
+
+        if exact or self.mode != 'ivf' or self.centroids is None:
+            candidates = None
+            scores = _scores(self.vectors, query)
+        else:
+            centroid_scores = _scores(self.centroids, query)
+            nprobe = min(self.nprobe, self.nlist)
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[list_no]:self.list_offsets[list_no + 1]]
+                for list_no in probed
+            ])
+            if not len(candidates):
+                return None, 0.0
+            scores = _scores(self.vectors[candidates], query)
+
+        best = int(np.argmax(scores))
+        best_id = best if candidates is None else int(candidates[best])
+        return str(self.labels[best_id]), float(scores[best])
+
+    def recall(self, queries):
+        """
+        Fraction of queries for which the approximate search returns the same
+        label as a brute-force scan. Useful for tuning `nprobe`.
+        """
+        if not queries:
+            return 1.0
+        hits = sum(
+            self.search(query)[0] == self.search(query, exact=True)[0]
+            for query in queries
+        )
+        return hits / len(queries)
+
+    def _dense_rows(self, rows):
+        selected = self.vectors[rows]
+        if sparse.issparse(selected):
+            selected = selected.toarray()
+        return np.array(selected, dtype=np.float64)
+
+    def _save(self, index_path, fingerprint):
+        # Written aside and renamed into place, so a worker loading the index
+        # concurrently never reads a partial file
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            joblib.dump({
+                'fingerprint': fingerprint,
+                'nlist': self.nlist,
+                'centroids': self.centroids,
+                'list_offsets': self.list_offsets,
+                'list_ids': self.list_ids,
+            }, tmp_path)
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            logger.error(f"Failed to save IVF index to {index_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _load(self, index_path, fingerprint):
+        if not os.path.exists(index_path):
+            return False
+        try:
+            state = joblib.load(index_path)
+        except Exception as e:
+            logger.warning(f"Failed to load IVF index from {index_path}: {e}")
+            return False
+        if state.get('fingerprint') != fingerprint:
+            return False
+
+        self.nlist = state['nlist']
+        self.centroids = state['centroids']
+        self.list_offsets = state['list_offsets']
+        self.list_ids = state['list_ids']
+        return True
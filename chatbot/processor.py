@@ -11,13 +11,15 @@ from utils.text_processor import preprocess_text
 from config import Config
 
 class ChatProcessor:
-    def __init__(self, intent_handler, response_generator):
+    def __init__(self, intent_handler, response_generator, conversation_writer=None):
         self.intent_handler = intent_handler
         self.response_generator = response_generator
+        # Optional write-behind ConversationWriter; turns are saved synchronously without one
+        self.conversation_writer = conversation_writer
         self.logger = setup_logger(__name__, Config.LOG_LEVEL, Config.LOG_FILE)
         self.logger.info("ChatProcessor initialized")
     
-    def process_message(self, user_message, user_id=None, conversation_id=None):
+    def process_message(self, user_message, user_id=None, conversation_id=None, ml_prediction=None, db_session=None):
         """
         Process a user message and generate a response
         
@@ -25,15 +27,19 @@ class ChatProcessor:
             user_message (str): The message from the user
             user_id (str, optional): The ID of the user
             conversation_id (str, optional): The ID of the conversation
+            ml_prediction (tuple, optional): Precomputed (intent, confidence) from the ML classifier
+            db_session (Session, optional): The request's database session; a new one is used if omitted
             
         Returns:
-            dict: A dictionary containing the bot's response and metadata
+            dict: A dictionary containing the bot's response and metadata,
+                  including the intent confidence, resolution stage and timings
         """
         try:
             processed_message = preprocess_text(user_message)
 
-            intent = self.intent_handler.detect_intent(user_message, user_id)
-            self.logger.info(f"Detected intent: {intent}")
+            intent_result = self.intent_handler.detect_intent(user_message, user_id, ml_prediction)
+            intent = intent_result['intent']
+            self.logger.info(f"Detected intent: {intent} via {intent_result['stage']}")
             
             # Generate a response based on the intent
             context = {
@@ -48,16 +54,34 @@ class ChatProcessor:
             if user_id and hasattr(self.intent_handler, 'context_manager'):
                  self.intent_handler.context_manager.update_context(user_id, user_message, intent, bot_response)
 
-            # Save the conversation to the database if user_id is provided
+            # Save the conversation to the database if user_id is provided. Turns
+            # queued for write-behind have no message id yet, but their
+            # conversation is created now so the client can continue it.
+            message_id = None
             if user_id:
-                self._save_conversation(user_id, user_message, bot_response, conversation_id)
+                queued = False
+                if self.conversation_writer is not None:
+                    conversation_id = self._ensure_conversation(user_id, conversation_id, db_session)
+                    queued = self.conversation_writer.submit(
+                        user_id, user_message, bot_response, conversation_id,
+                        intent=intent, confidence=intent_result['confidence']
+                    )
+                if not queued:
+                    conversation_id, message_id = self._save_conversation(
+                        user_id, user_message, bot_response, conversation_id, db_session,
+                        intent=intent, confidence=intent_result['confidence']
+                    )
             
             # Return the response with metadata
             return {
                 'response': bot_response,
                 'intent': intent,
+                'confidence': intent_result['confidence'],
+                'stage': intent_result['stage'],
+                'timings': intent_result['timings'],
                 'timestamp': context['timestamp'],
-                'conversation_id': conversation_id
+                'conversation_id': conversation_id,
+                'message_id': message_id
             }
             
         except Exception as e:
@@ -65,11 +89,40 @@ class ChatProcessor:
             return {
                 'response': "I'm sorry, I encountered an error while processing your message.",
                 'intent': 'error',
+                'confidence': 0.0,
+                'stage': 'error',
+                'timings': {},
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'conversation_id': conversation_id
+                'conversation_id': conversation_id,
+                'message_id': None
             }
     
-    def _save_conversation(self, user_id, user_message, bot_response, conversation_id=None):
+    def _ensure_conversation(self, user_id, conversation_id=None, db_session=None):
+        """
+        Returns the ID of the conversation, creating it first if it does
+        not exist yet; on error the given ID is returned unchanged.
+        """
+        owns_session = db_session is None
+        try:
+            if owns_session:
+                db_session = get_db_session()
+            if conversation_id and db_session.get(Conversation, conversation_id) is not None:
+                return conversation_id
+            conversation = Conversation(user_id=user_id)
+            db_session.add(conversation)
+            db_session.commit()
+            return conversation.id
+        except Exception as e:
+            self.logger.error(f"Error creating conversation: {str(e)}")
+            if db_session:
+                db_session.rollback()
+            return conversation_id
+        finally:
+            if owns_session and db_session:
+                db_session.close()
+
+    def _save_conversation(self, user_id, user_message, bot_response, conversation_id=None, db_session=None,
+                           intent=None, confidence=None):
         """
         Save the conversation to the database
         
@@ -78,13 +131,18 @@ class ChatProcessor:
             user_message (str): The message from the user
             bot_response (str): The response from the bot
             conversation_id (str, optional): The ID of the conversation
+            db_session (Session, optional): Session to write with; it is left open for its owner
+            intent (str, optional): Intent detected for the user message
+            confidence (float, optional): Confidence of that intent
             
         Returns:
-            str: The ID of the conversation
+            tuple: (conversation ID, ID of the bot message or None if the
+                   write failed)
         """
-        db_session = None
+        owns_session = db_session is None
         try:
-            db_session = get_db_session()
+            if owns_session:
+                db_session = get_db_session()
             
             # If no conversation_id is provided, create a new conversation
             if not conversation_id:
@@ -107,6 +165,8 @@ class ChatProcessor:
                 conversation_id=conversation_id,
                 sender='user',
                 content=user_message,
+                intent=intent,
+                confidence=confidence,
                 timestamp=datetime.now()
             )
             db_session.add(user_msg)
@@ -124,14 +184,14 @@ class ChatProcessor:
             conversation.last_updated = datetime.now()
             
             db_session.commit()
-            return conversation_id
+            return conversation_id, bot_msg.id
             
         except Exception as e:
             self.logger.error(f"Error saving conversation: {str(e)}")
             if db_session:
                 db_session.rollback()
-            return conversation_id
+            return conversation_id, None
             
         finally:
-            if db_session:
+            if owns_session and db_session:
                 db_session.close()
@@ -1,101 +1,183 @@
 import random
 import json
 import os
-from datetime import datetime
+import threading
+import uuid
 
 # Import database handlers
-from database.db_handler import get_db_session, get_intent_responses
+from database.db_handler import get_db_session, get_response_texts, on_intent_change
 from database.models import Intent, Response
+from chatbot.response_template import ResponseTemplate, DEFAULT_RESOLVERS
 from config import Config
 
 class ResponseGenerator:
     def __init__(self):
         self.responses = {}
+        # Parsed form of self.responses, used when generating responses
+        self.templates = {}
         self.default_response = Config.DEFAULT_RESPONSE
+        self.default_template = ResponseTemplate(self.default_response)
+        # Placeholder name -> callable(context); see register_resolver
+        self.resolvers = dict(DEFAULT_RESOLVERS)
+        # Intent ids/names changed in the database since the last refresh
+        self._stale_ids = set()
+        self._stale_names = set()
+        self._stale_lock = threading.Lock()
+        # Token of Config.RESPONSES_VERSION_PATH the loaded responses reflect
+        self._version = None
         self.load_responses()
+        on_intent_change(self.mark_stale)
     
     def load_responses(self):
-        db_session = None
+        """Load the responses of all intents with one joined query"""
+        # Read first, so a change published while loading triggers another reload
+        self._version = self._read_version()
         try:
-            db_session = get_db_session()
-            if not db_session:
-                raise Exception("Failed to create database session")
+            responses = self._group_responses(get_response_texts())
+        except Exception as e:
+            print(f"Error loading responses from database: {str(e)}")
+            responses = {}
 
-            intents = db_session.query(Intent).all()
-            self.responses = {}
+        # Built aside and swapped in, so concurrent requests never see a partial table
+        self._merge_file_responses(responses)
+        self.templates = {
+            intent_name: [ResponseTemplate(text) for text in texts]
+            for intent_name, texts in responses.items()
+        }
+        self.responses = responses
 
-            for intent in intents:
-                responses = get_intent_responses(intent.id)
-                response_texts = [response.text for response in responses]
+    def refresh_intents(self, intent_names=(), intent_ids=()):
+        """Reload the responses of just the given intents, e.g. after an admin edit
 
-                self.responses[intent.name] = response_texts
+        Intents that no longer exist in the database or the training data
+        are dropped.
+        """
+        intent_names = set(intent_names)
+        try:
+            fresh = self._group_responses(get_response_texts(intent_ids=set(intent_ids), intent_names=intent_names))
+        except Exception as e:
+            print(f"Error refreshing responses from database: {str(e)}")
+            return
 
-            self._merge_file_responses()
+        file_responses = self._load_file_responses()
+        for intent_name in intent_names | set(fresh):
+            responses = fresh.get(intent_name) or file_responses.get(intent_name)
+            if responses:
+                self.templates[intent_name] = [ResponseTemplate(text) for text in responses]
+                self.responses[intent_name] = responses
+            else:
+                self.responses.pop(intent_name, None)
+                self.templates.pop(intent_name, None)
 
-        except Exception as e:
-            print(f"Error loading responses from database: {str(e)}")
-            self.responses = {}
-            self._merge_file_responses()
-        finally:
-            if db_session is not None:
-                db_session.close()
-    
-    def _merge_file_responses(self):
+    def mark_stale(self, intent_ids, intent_names):
+        """Database change hook; the affected intents are refreshed before the next response"""
+        with self._stale_lock:
+            self._stale_ids.update(intent_ids)
+            self._stale_names.update(intent_names)
+        self.publish_change()
+
+    def _read_version(self):
         try:
-            with open(Config.TRAINING_DATA_PATH, 'r') as file:
-                data = json.load(file)
+            with open(Config.RESPONSES_VERSION_PATH, 'r') as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def publish_change(self):
+        """Tell the other worker processes to reload their responses
+
+        This process has already refreshed (or marked stale) what it changed,
+        so it records the new token as seen.
+        """
+        token = uuid.uuid4().hex
+        tmp_path = f"{Config.RESPONSES_VERSION_PATH}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(Config.RESPONSES_VERSION_PATH)), exist_ok=True)
+            with open(tmp_path, 'w') as file:
+                file.write(token)
+            os.replace(tmp_path, Config.RESPONSES_VERSION_PATH)
+        except OSError as e:
+            print(f"Error publishing response change: {str(e)}")
+            return
+        self._version = token
 
-                for intent in data.get('intents', []):
-                    intent_name = intent.get('tag')
-                    responses = intent.get('responses', [])
+    def responses_changed(self):
+        """True if another process changed responses since they were loaded"""
+        version = self._read_version()
+        return version is not None and version != self._version
 
-                    if not intent_name:
-                        continue
+    def _refresh_stale(self):
+        with self._stale_lock:
+            intent_ids, self._stale_ids = self._stale_ids, set()
+            intent_names, self._stale_names = self._stale_names, set()
+        if intent_ids or intent_names:
+            self.refresh_intents(intent_names, intent_ids)
 
-                    if intent_name not in self.responses or not self.responses[intent_name]:
-                        self.responses[intent_name] = responses
+    def _group_responses(self, rows):
+        responses = {}
+        for intent_name, text in rows:
+            texts = responses.setdefault(intent_name, [])
+            if text is not None:
+                texts.append(text)
+        return responses
 
+    def _load_file_responses(self):
+        try:
+            with open(Config.TRAINING_DATA_PATH, 'r') as file:
+                data = json.load(file)
         except Exception as e:
             print(f"Error loading responses from file: {str(e)}")
-            if not self.responses:
-                self.responses = {
-                    'greeting': ['Hello! How can I help you today?', 'Hi there!'],
-                    'goodbye': ['Goodbye!', 'See you later!'],
-                    'thanks': ['You\'re welcome!', 'Happy to help!'],
-                    'unknown': [self.default_response]
-                }
+            return {}
+
+        return {
+            intent['tag']: intent.get('responses', [])
+            for intent in data.get('intents', [])
+            if intent.get('tag')
+        }
+
+    def _merge_file_responses(self, responses):
+        file_responses = self._load_file_responses()
+        for intent_name, texts in file_responses.items():
+            if intent_name not in responses or not responses[intent_name]:
+                responses[intent_name] = texts
+
+        if not file_responses and not responses:
+            responses.update({
+                'greeting': ['Hello! How can I help you today?', 'Hi there!'],
+                'goodbye': ['Goodbye!', 'See you later!'],
+                'thanks': ['You\'re welcome!', 'Happy to help!'],
+                'unknown': [self.default_response]
+            })
     
     def generate_response(self, intent, context=None):
         """Generate a response based on the intent and context"""
+        if self._stale_ids or self._stale_names:
+            self._refresh_stale()
+
         # If we have responses for this intent, choose one randomly
-        if intent in self.responses and self.responses[intent]:
-            response = random.choice(self.responses[intent])
+        templates = self.templates.get(intent)
+        if templates:
+            template = random.choice(templates)
         else:
             # Use default response for unknown intents
-            response = self.default_response
+            template = self.default_template
         
-        # Process any dynamic content in the response
-        response = self.process_dynamic_content(response, context)
-        
-        return response
+        # Fill in any dynamic content in the response
+        return template.render(context, self.resolvers)
     
     def process_dynamic_content(self, response, context=None):
-        """Process any dynamic content in the response"""
-        # Replace placeholders with dynamic content
-        if '{time}' in response:
-            current_time = datetime.now().strftime('%H:%M')
-            response = response.replace('{time}', current_time)
-        
-        if '{date}' in response:
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            response = response.replace('{date}', current_date)
-        
-        # If we have context, we can use it to personalize the response
-        if context:
-            if '{name}' in response and 'name' in context:
-                response = response.replace('{name}', context['name'])
-        
-        return response
+        """Process any dynamic content in an arbitrary response text"""
+        return ResponseTemplate(response).render(context, self.resolvers)
+    
+    def register_resolver(self, placeholder, resolver):
+        """Make {placeholder} resolvable in responses
+
+        Args:
+            placeholder (str): Placeholder name, without braces
+            resolver (callable): Called with the request context; returns the
+                replacement text, or None to leave the placeholder as is
+        """
+        self.resolvers[placeholder] = resolver
     
     def add_response(self, intent, response_text):
         """Add a new response for an intent"""
@@ -108,6 +190,7 @@ class ResponseGenerator:
         
         if response_text not in self.responses[intent]:
             self.responses[intent].append(response_text)
+            self.templates.setdefault(intent, []).append(ResponseTemplate(response_text))
             
             # Save to database
             db_session = None
@@ -141,6 +224,7 @@ class ResponseGenerator:
         """Remove a response for an intent"""
         if intent in self.responses and response_text in self.responses[intent]:
             self.responses[intent].remove(response_text)
+            self.templates[intent] = [ResponseTemplate(text) for text in self.responses[intent]]
             
             # Remove from database
             db_session = None
@@ -0,0 +1,71 @@
+import re
+from datetime import datetime
+
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+
+# Built-in placeholder resolvers: name -> callable(context) returning the
+# replacement text, or None to leave the placeholder as it is
+DEFAULT_RESOLVERS = {
+    'time': lambda context: datetime.now().strftime('%H:%M'),
+    'date': lambda context: datetime.now().strftime('%Y-%m-%d'),
+}
+
+class ResponseTemplate:
+    """
+    A response text parsed once into literal and placeholder segments.
+
+    Rendering resolves each distinct placeholder once and joins the
+    segments; texts without placeholders are returned unchanged.
+    Placeholders that no resolver or context key can fill stay literal.
+    """
+    __slots__ = ('text', 'segments', 'slots', 'placeholders')
+
+    def __init__(self, text):
+        self.text = text
+        self.segments = []
+        # (segment index, placeholder name) for every placeholder occurrence
+        self.slots = []
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                self.segments.append(text[position:match.start()])
+            self.slots.append((len(self.segments), match.group(1)))
+            self.segments.append(match.group(0))
+            position = match.end()
+        if position < len(text):
+            self.segments.append(text[position:])
+
+        self.placeholders = {name for _, name in self.slots}
+
+    def render(self, context=None, resolvers=None):
+        """
+        Args:
+            context (dict, optional): Request data (user_id, name, ...); any
+                key can be used as a placeholder.
+            resolvers (dict, optional): Placeholder name -> callable(context);
+                take precedence over context keys.
+
+        Returns:
+            str: The rendered response.
+        """
+        if not self.slots:
+            return self.text
+
+        context = context or {}
+        resolvers = DEFAULT_RESOLVERS if resolvers is None else resolvers
+        values = {}
+        for name in self.placeholders:
+            resolver = resolvers.get(name)
+            value = resolver(context) if resolver else context.get(name)
+            if value is not None:
+                values[name] = str(value)
+
+        segments = list(self.segments)
+        for index, name in self.slots:
+            if name in values:
+                segments[index] = values[name]
+        return ''.join(segments)
+
+    def __repr__(self):
+        return f"<ResponseTemplate({self.text[:20]!r})>"
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+def cache_key(*parts):
+    """
+    Short content key for a shared matrix, derived from whatever determines
+    its contents (file digests, model names, versions).
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+def _pack(matrix, labels):
+    """
+    Splits a dense or CSR matrix (plus optional labels) into flat arrays.
+    """
+    if sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        arrays = {'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr}
+        meta = {'format': 'csr', 'shape': list(matrix.shape)}
+    else:
+        arrays = {'dense': np.ascontiguousarray(matrix)}
+        meta = {'format': 'dense'}
+    if labels is not None:
+        arrays['labels'] = np.asarray(labels).astype(str)
+    return arrays, meta
+
+def _unpack(arrays, meta):
+    if meta['format'] == 'csr':
+        # Wraps the mapped arrays without copying them
+        matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(meta['shape'])
+        )
+    else:
+        matrix = arrays['dense']
+    return matrix, arrays.get('labels')
+
+def _load(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+            for name in meta['arrays']
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return _unpack(arrays, meta)
+
+def _publish(cache_dir, name, key, matrix, labels):
+    """
+    Writes the arrays to a private directory and renames it into place. When
+    several workers race, the first rename wins and the others drop theirs.
+    """
+    arrays, meta = _pack(matrix, labels)
+    meta['arrays'] = sorted(arrays)
+
+    final_dir = os.path.join(cache_dir, f"{name}-{key}")
+    tmp_dir = os.path.join(cache_dir, f".{name}-{key}.tmp-{os.getpid()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        for array_name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{array_name}.npy"), array, allow_pickle=False)
+        # meta.json marks the directory as complete
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, final_dir)
+    except OSError:
+        if not os.path.isdir(final_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Older generations of this matrix; workers still mapping them keep
+    # their pages until they reload
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(f"{name}-") and entry != f"{name}-{key}":
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+def shared_matrix(cache_dir, name, key, build):
+    """
+    Returns a read-only matrix memory-mapped from `cache_dir`, so every worker
+    process on the machine shares one physical copy through the page cache.
+
+    The first worker to need a given `key` calls build() and publishes the
+    result; the others (and later restarts) only map the files. If the cache
+    cannot be written, the freshly built matrix is returned as is.
+
+    Args:
+        cache_dir (str): Directory holding the shared matrices.
+        name (str): Matrix name, e.g. 'tfidf_patterns'.
+        key (str): Content key; a new key replaces older files of `name`.
+        build (callable): Returns (matrix, labels); labels may be None.
+
+    Returns:
+        tuple: (matrix, labels), dense ndarray or CSR matrix plus label array.
+    """
+    directory = os.path.join(cache_dir, f"{name}-{key}")
+    shared = _load(directory)
+    if shared is not None:
+        return shared
+
+    matrix, labels = build()
+    if matrix is None:
+        return None, None
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _publish(cache_dir, name, key, matrix, labels)
+    except OSError as e:
+        logger.warning(f"Could not share {name} through {cache_dir}: {e}")
+        return matrix, labels
+
+    shared = _load(directory)
+    if shared is None:
+        return matrix, labels
+    logger.info(f"Published shared matrix {name} ({key}) to {cache_dir}")
+    return shared
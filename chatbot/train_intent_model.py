@@ -1,38 +1,152 @@
+import hashlib
 import json
+import math
 import os
-import re
-import nltk
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
 import joblib
 import numpy as np
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-
-# Ensure NLTK data is available
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+
+# Allow running this file directly as a script from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.text_processor import preprocess_text, preprocess_many, PREPROCESS_VERSION
+from chatbot.compact_model import export_compact_model, file_digest
+from chatbot.corpus_cache import PreprocessedPatternCache
+from config import Config
+
+ARTIFACTS = ('tfidf_vectorizer.pkl', 'intent_classifier.pkl')
+
+# Hashing mode spreads the cleaned corpus over shard files at random and
+# reads one at a time, so each epoch sees a shuffled corpus without holding
+# all of it in memory. A shard holds about this many HASHING_BATCH_SIZE
+# batches; the shard count follows from the corpus size, up to
+# MAX_STREAM_SHARDS files open at once.
+STREAM_SHARD_BATCHES = 4
+MAX_STREAM_SHARDS = 512
+
+def read_training_patterns(data_path):
+    """
+    Returns (patterns, intent_tags) of training_data.json, unprocessed.
+    """
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"Training data not found at {data_path}")
+        
+    with open(data_path, 'r') as f:
+        data = json.load(f)
+        
+    patterns = []
+    tags = []
+    for intent in data['intents']:
+        for pattern in intent['patterns']:
+            patterns.append(pattern)
+            tags.append(intent['tag'])
+    return patterns, tags
+
+def iter_utterances(path, batch_size):
+    """
+    Streams a JSONL file of {"text": ..., "intent": ...} records as
+    (texts, intent_tags) batches; malformed lines are skipped.
+    """
+    texts = []
+    tags = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                text, tag = record['text'], record['intent']
+            except (ValueError, KeyError, TypeError):
+                continue
+            texts.append(text)
+            tags.append(tag)
+            if len(texts) >= batch_size:
+                yield texts, tags
+                texts, tags = [], []
+    if texts:
+        yield texts, tags
+
+def load_training_corpus(data_path, preprocess_all=None):
+    """
+    Loads training data from a JSON file and preprocesses every pattern.
+    
+    Args:
+        data_path (str): Path of training_data.json
+        preprocess_all (callable, optional): List of patterns -> list of
+            cleaned texts in the same order, e.g. a PreprocessedPatternCache.
+            Defaults to preprocessing serially in this process.
+    
+    Returns:
+        tuple: (preprocessed_patterns, intent_tags), skipping patterns that are
+               empty after cleaning.
+    """
+    patterns, tags = read_training_patterns(data_path)
+
+    if preprocess_all is None:
+        cleaned_patterns = [preprocess_text(pattern) for pattern in patterns]
+    else:
+        cleaned_patterns = preprocess_all(patterns)
+
+    X = []
+    y = []
+    for cleaned_pattern, tag in zip(cleaned_patterns, tags):
+        if cleaned_pattern: # Ensure not empty after cleaning
+            X.append(cleaned_pattern)
+            y.append(tag)
+                
+    return X, y
 
 class IntentModelTrainer:
     """
-    Trains a Logistic Regression model on TF-IDF vectors for intent classification.
+    Trains the intent classifier selected by Config.FEATURE_MODE:
+
+    - 'tfidf': Logistic Regression on TF-IDF vectors, fitted on the whole
+      corpus in memory.
+    - 'hashing': SGDClassifier (log loss) on hashed features, trained with
+      partial_fit over a corpus streamed from disk, optionally extended with
+      the utterances in Config.TRAINING_UTTERANCES_PATH. One shard of about
+      STREAM_SHARD_BATCHES * HASHING_BATCH_SIZE samples is in memory at a
+      time (more once the corpus needs over MAX_STREAM_SHARDS shards) and
+      there is no vocabulary to store.
+
+    Either way the artifacts are saved under the same file names.
     """
     def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
-        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=5000)
-        self.classifier = LogisticRegression(max_iter=1000, random_state=42)
+        self.feature_mode = Config.FEATURE_MODE
+        self.utterances_path = Config.TRAINING_UTTERANCES_PATH
+
+        # Imported here so the inference path can use this module without sklearn
+        if self.feature_mode == 'hashing':
+            from sklearn.feature_extraction.text import HashingVectorizer
+            from sklearn.linear_model import SGDClassifier
+
+            self.vectorizer = HashingVectorizer(
+                ngram_range=(1, 2),
+                n_features=Config.HASHING_N_FEATURES,
+                alternate_sign=False
+            )
+            self.classifier = SGDClassifier(loss='log_loss', alpha=Config.HASHING_ALPHA, random_state=42)
+        elif self.feature_mode == 'tfidf':
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+
+            self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=5000)
+            self.classifier = LogisticRegression(max_iter=1000, random_state=42)
+        else:
+            raise ValueError(f"Unknown FEATURE_MODE '{self.feature_mode}' (expected 'tfidf' or 'hashing')")
+
+        # How the last train() fitted the classifier, see _fit()
+        self.fit_stats = None
+        self._feature_overlap = None
         
         # Paths
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.data_path = os.path.join(self.base_dir, '..', 'data', 'training_data.json')
         self.model_dir = os.path.join(self.base_dir, 'model')
+        self.meta_path = os.path.join(self.model_dir, 'training_meta.json')
+        self.cache_path = os.path.join(self.model_dir, 'preprocessed_patterns.json')
         
         # Ensure model directory exists
         os.makedirs(self.model_dir, exist_ok=True)
@@ -40,68 +154,361 @@ class IntentModelTrainer:
     def preprocess_text(self, text):
         """
         Cleans and normalizes text: lowercase, remove punctuation/numbers, remove stopwords, lemmatize.
+        Delegates to the shared, memoized utils.text_processor.preprocess_text.
         """
-        # Lowercase
-        text = text.lower()
-        # Remove punctuation and numbers
-        text = re.sub(r'[^a-z\s]', '', text)
-        # Tokenize
-        tokens = nltk.word_tokenize(text)
-        # Remove stopwords and lemmatize
-        tokens = [self.lemmatizer.lemmatize(word) for word in tokens if word not in self.stop_words]
-        return ' '.join(tokens)
+        return preprocess_text(text)
 
     def load_data(self):
         """
-        Loads training data from JSON file.
+        Loads training data from JSON file. Patterns preprocessed by earlier
+        runs are taken from the on-disk cache; the rest are preprocessed in
+        parallel once there are Config.PREPROCESS_PARALLEL_MIN of them.
         """
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"Training data not found at {self.data_path}")
-            
-        with open(self.data_path, 'r') as f:
-            data = json.load(f)
-            
-        X = []
-        y = []
-        
-        for intent in data['intents']:
-            tag = intent['tag']
-            for pattern in intent['patterns']:
-                cleaned_pattern = self.preprocess_text(pattern)
-                if cleaned_pattern: # Ensure not empty after cleaning
-                    X.append(cleaned_pattern)
-                    y.append(tag)
-                    
+        cache = PreprocessedPatternCache(self.cache_path)
+        X, y = load_training_corpus(self.data_path, preprocess_all=cache.preprocess_all)
+        cache.save()
+        print(f"Preprocessed {cache.misses} patterns ({cache.hits} cached)")
         return X, y
 
-    def train(self):
+    def fingerprint(self):
         """
-        Trains the model and saves artifacts.
+        Digest of everything that determines the trained artifacts: the
+        training data, the preprocessing version and the model parameters.
         """
-        print("Loading data...")
-        X_raw, y = self.load_data()
-        
-        print(f"Training on {len(X_raw)} samples...")
+        utterances_digest = None
+        if self.feature_mode == 'hashing' and self.utterances_path:
+            utterances_digest = file_digest(self.utterances_path)
+
+        digest = hashlib.sha1()
+        for part in (
+            file_digest(self.data_path),
+            utterances_digest,
+            PREPROCESS_VERSION,
+            sorted(self.vectorizer.get_params().items(), key=lambda item: item[0]),
+            sorted(self.classifier.get_params().items(), key=lambda item: item[0])
+        ):
+            digest.update(repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def is_up_to_date(self, fingerprint):
+        """
+        True if the saved artifacts were trained from this exact fingerprint
+        and have not been replaced since.
+        """
+        meta = self._read_meta()
+        if meta.get('fingerprint') != fingerprint:
+            return False
+        try:
+            return all(
+                meta['artifacts'].get(name) == file_digest(os.path.join(self.model_dir, name))
+                for name in ARTIFACTS
+            )
+        except (OSError, KeyError, AttributeError):
+            return False
+
+    def train(self, progress_callback=None, force=False):
+        """
+        Trains the model and saves artifacts, unless the saved artifacts
+        were already trained from the same corpus and settings.
         
-        # Vectorize
-        X_vectorized = self.vectorizer.fit_transform(X_raw)
+        Args:
+            progress_callback (callable, optional): Called as (stage, fraction_done)
+                as training advances, e.g. to report progress of a background job.
+            force (bool): Retrain even if nothing has changed.
         
-        # Train classifier
-        self.classifier.fit(X_vectorized, y)
+        Returns:
+            bool: True if new artifacts were written, False if training was skipped.
+        """
+        def report(stage, progress):
+            if progress_callback:
+                progress_callback(stage, progress)
+
+        fingerprint = self.fingerprint()
+        if not force and self.is_up_to_date(fingerprint):
+            print("Training data and settings unchanged; keeping the existing model.")
+            report('skipped', 1.0)
+            return False
+
+        print("Loading data...")
+        report('loading_data', 0.0)
+        if self.feature_mode == 'hashing':
+            samples = self._train_streaming(report)
+        else:
+            X_raw, y = self.load_data()
+            samples = len(X_raw)
+            
+            print(f"Training on {samples} samples...")
+            
+            # Vectorize
+            report('vectorizing', 0.3)
+            X_vectorized = self.vectorizer.fit_transform(X_raw)
+            
+            # Train classifier
+            report('fitting', 0.5)
+            self.fit_stats = self._fit(X_vectorized, y)
         
         # Save artifacts
         print("Saving model artifacts...")
-        joblib.dump(self.vectorizer, os.path.join(self.model_dir, 'tfidf_vectorizer.pkl'))
-        joblib.dump(self.classifier, os.path.join(self.model_dir, 'intent_classifier.pkl'))
+        report('saving', 0.9)
+        self._save_artifact(self.vectorizer, 'tfidf_vectorizer.pkl')
+        self._save_artifact(self.classifier, 'intent_classifier.pkl')
+        if self.feature_mode == 'hashing':
+            self._remove_compact()
+        else:
+            self._export_compact()
+        self._save_meta(fingerprint, samples)
         
+        report('trained', 1.0)
         print("Training completed successfully.")
+        return True
+
+    def _fit(self, X_vectorized, y):
+        """
+        Fits the TF-IDF classifier, warm-started from the deployed model when
+        it is compatible (see _warm_start). The problem is convex, so a warm
+        start reaches the same solution as a cold fit, in fewer iterations.
+
+        Savings are measured against a cold baseline: the iteration count of
+        the most recent cold fit, recorded in training_meta.json. Until one
+        is recorded the fit is cold, so every warm fit has a real baseline.
+        iterations_saved is cold_baseline['n_iter'] - n_iter; the baseline
+        was fitted on the corpus of its time (cold_baseline['samples']).
+
+        Returns:
+            dict: 'mode' ('warm' or 'cold'), 'n_iter', the 'cold_baseline',
+                  the iterations saved against it, fit seconds, and why a
+                  cold fit was used.
+        """
+        baseline = (self._read_meta().get('fit') or {}).get('cold_baseline')
+        if not Config.WARM_START_ENABLED:
+            reason = 'warm start disabled'
+        elif not baseline:
+            reason = 'no cold baseline recorded yet'
+        else:
+            reason = self._warm_start(y)
+        warm = reason is None
+
+        start = time.perf_counter()
+        try:
+            self.classifier.fit(X_vectorized, y)
+        finally:
+            self.classifier.set_params(warm_start=False)
+        seconds = time.perf_counter() - start
+
+        n_iter = int(np.max(self.classifier.n_iter_))
+        if not warm:
+            baseline = {
+                'n_iter': n_iter,
+                'samples': X_vectorized.shape[0],
+                'fit_seconds': round(seconds, 3),
+                'fitted_at': datetime.now().isoformat()
+            }
+        stats = {
+            'mode': 'warm' if warm else 'cold',
+            'n_iter': n_iter,
+            'cold_baseline': baseline,
+            'iterations_saved': baseline['n_iter'] - n_iter if warm else None,
+            'fit_seconds': round(seconds, 3),
+            'feature_overlap': self._feature_overlap,
+            'cold_reason': reason
+        }
+        if warm:
+            print(f"Warm-started fit converged in {n_iter} iterations "
+                  f"(cold baseline: {baseline['n_iter']}, saved {stats['iterations_saved']}).")
+        else:
+            print(f"Cold fit converged in {n_iter} iterations ({reason}).")
+        return stats
+
+    def _warm_start(self, y):
+        """
+        Initializes the classifier with the deployed coefficients, remapped
+        column by column onto the new vocabulary (new terms start at zero).
+
+        Returns:
+            str: Why a warm start is not possible, or None if it was set up.
+        """
+        self._feature_overlap = None
+        try:
+            old_vectorizer = joblib.load(os.path.join(self.model_dir, 'tfidf_vectorizer.pkl'))
+            old_classifier = joblib.load(os.path.join(self.model_dir, 'intent_classifier.pkl'))
+        except Exception as e:
+            return f"no deployed model to start from: {e}"
+
+        def params(estimator):
+            return {key: value for key, value in estimator.get_params().items() if key != 'warm_start'}
+
+        if type(old_classifier) is not type(self.classifier) or type(old_vectorizer) is not type(self.vectorizer):
+            return "deployed model is of a different type"
+        if params(old_classifier) != params(self.classifier) or params(old_vectorizer) != params(self.vectorizer):
+            return "model parameters changed"
+        if list(old_classifier.classes_) != sorted(set(y)):
+            return "intent set changed"
+
+        old_vocabulary = old_vectorizer.vocabulary_
+        old_columns = np.full(len(self.vectorizer.vocabulary_), -1)
+        for term, column in self.vectorizer.vocabulary_.items():
+            old_columns[column] = old_vocabulary.get(term, -1)
+        shared = old_columns >= 0
+        self._feature_overlap = round(float(shared.mean()), 4)
+        if self._feature_overlap < Config.WARM_START_MIN_OVERLAP:
+            return f"only {self._feature_overlap:.0%} of the vocabulary is shared"
+
+        coef = np.zeros((old_classifier.coef_.shape[0], len(old_columns)))
+        coef[:, shared] = old_classifier.coef_[:, old_columns[shared]]
+        self.classifier.set_params(warm_start=True)
+        self.classifier.coef_ = coef
+        self.classifier.intercept_ = np.array(old_classifier.intercept_, dtype=np.float64)
+        return None
+
+    def _cleaned_batches(self):
+        """
+        Yields (cleaned_texts, intent_tags) batches: the training data
+        patterns (through the preprocessing cache), then the utterances file.
+        """
+        cache = PreprocessedPatternCache(self.cache_path)
+        patterns, tags = read_training_patterns(self.data_path)
+        cleaned = cache.preprocess_all(patterns)
+        cache.save()
+        print(f"Preprocessed {cache.misses} patterns ({cache.hits} cached)")
+        yield cleaned, tags
+
+        if self.utterances_path:
+            for texts, tags in iter_utterances(self.utterances_path, Config.HASHING_BATCH_SIZE):
+                yield preprocess_many(texts), tags
+
+    def _train_streaming(self, report):
+        """
+        Hashing mode: spools the cleaned corpus to disk, counting it, then
+        deals it out to randomly assigned shard files sized from that count
+        and runs HASHING_EPOCHS passes of partial_fit, visiting the shards in
+        random order and shuffling each in memory.
+
+        Returns:
+            int: Number of training samples
+        """
+        self.fit_stats = {'mode': 'streaming'}
+        rng = random.Random(42)
+        batch_size = max(1, Config.HASHING_BATCH_SIZE)
+        epochs = max(1, Config.HASHING_EPOCHS)
+
+        with tempfile.TemporaryDirectory(prefix='.corpus-', dir=self.model_dir) as shard_dir:
+            spool_path = os.path.join(shard_dir, 'corpus.jsonl')
+            classes = set()
+            samples = 0
+            with open(spool_path, 'w', encoding='utf-8') as spool:
+                for cleaned_texts, tags in self._cleaned_batches():
+                    for cleaned, tag in zip(cleaned_texts, tags):
+                        if cleaned: # Ensure not empty after cleaning
+                            spool.write(json.dumps([cleaned, tag]) + '\n')
+                            classes.add(tag)
+                            samples += 1
+
+            if not samples:
+                raise ValueError("No training samples left after preprocessing")
+
+            shard_count = min(MAX_STREAM_SHARDS, math.ceil(samples / (STREAM_SHARD_BATCHES * batch_size)))
+            shard_paths = [os.path.join(shard_dir, f"{i}.jsonl") for i in range(shard_count)]
+            shards = [open(path, 'w', encoding='utf-8') for path in shard_paths]
+            try:
+                with open(spool_path, 'r', encoding='utf-8') as spool:
+                    for line in spool:
+                        shards[rng.randrange(shard_count)].write(line)
+            finally:
+                for shard in shards:
+                    shard.close()
+            os.remove(spool_path)
+            print(f"Training on {samples} samples ({epochs} epochs)...")
+            classes = np.array(sorted(classes))
+
+            for epoch in range(epochs):
+                report('fitting', 0.3 + 0.6 * epoch / epochs)
+                rng.shuffle(shard_paths)
+                for path in shard_paths:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        rows = [json.loads(line) for line in f]
+                    rng.shuffle(rows)
+                    for start in range(0, len(rows), batch_size):
+                        batch = rows[start:start + batch_size]
+                        self.classifier.partial_fit(
+                            self.vectorizer.transform([text for text, _ in batch]),
+                            [tag for _, tag in batch],
+                            classes=classes
+                        )
+        return samples
+
+    def _save_artifact(self, obj, filename):
+        """
+        Writes an artifact to a temporary file and renames it into place, so
+        servers hot-reloading the model never read a partially written file.
+        """
+        path = os.path.join(self.model_dir, filename)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(obj, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, fingerprint, samples):
+        """
+        Records what the artifacts were trained from, for is_up_to_date(),
+        and how the classifier was fitted.
+        """
+        meta = {
+            'fingerprint': fingerprint,
+            'preprocess_version': PREPROCESS_VERSION,
+            'samples': samples,
+            'trained_at': datetime.now().isoformat(),
+            'fit': self.fit_stats,
+            'artifacts': {name: file_digest(os.path.join(self.model_dir, name)) for name in ARTIFACTS}
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def _export_compact(self):
+        """
+        Mirrors the saved artifacts in the flat-array format loaded by
+        MLIntentClassifier without sklearn. Failures only cost that fast path.
+        """
+        try:
+            export_compact_model(
+                self.vectorizer,
+                self.classifier,
+                os.path.join(self.model_dir, 'compact'),
+                source_digests={
+                    name: file_digest(os.path.join(self.model_dir, name))
+                    for name in ARTIFACTS
+                }
+            )
+        except Exception as e:
+            print(f"Skipping compact model export: {e}")
+
+    def _remove_compact(self):
+        """
+        Hashed features have no compact export; drop the one left by an
+        earlier TF-IDF model so MODEL_FORMAT=compact cannot serve it.
+        """
+        compact_dir = os.path.join(self.model_dir, 'compact')
+        if os.path.isdir(compact_dir):
+            shutil.rmtree(compact_dir, ignore_errors=True)
+            print("Removed the compact export of the previous TF-IDF model.")
 
-def train_model():
+def train_model(progress_callback=None, force=False):
     """
     Convenience function for triggering training from other modules.
+    
+    Returns:
+        bool: False if the existing model was already up to date.
     """
     trainer = IntentModelTrainer()
-    trainer.train()
+    return trainer.train(progress_callback=progress_callback, force=force)
 
 if __name__ == "__main__":
-    train_model()
+    train_model(force='--force' in sys.argv)
@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert, update
+
+from database.db_handler import get_db_session
+from database.models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the queue on shutdown
+_STOP = object()
+
+class ConversationWriter:
+    """
+    Write-behind persistence for chat turns.
+
+    submit() only enqueues the turn, so the reply is not held up by the
+    database. A background thread writes queued turns in bulk, in one
+    transaction per batch, as soon as `batch_size` turns are waiting or the
+    oldest has waited `max_wait_ms`. A failed batch is retried up to
+    `max_attempts` times; after that, and on stop(), whatever cannot be
+    written is appended to a JSONL spill file, which start() replays.
+    """
+    def __init__(self, batch_size=100, max_wait_ms=200, max_queue=10000, spill_path=None, max_attempts=5):
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._retry = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.last_flush_lag_ms = 0.0
+        self.max_flush_lag_ms = 0.0
+        self._total_flush_lag = 0.0
+
+    def start(self):
+        """
+        Replays spilled turns and starts the background writer.
+        """
+        if self._thread is not None:
+            return
+        self._replay_spill()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='unibot-write-behind', daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind started (batch_size={self.batch_size}, max_wait_ms={self.max_wait * 1000:g})")
+
+    def stop(self, timeout=10.0):
+        """
+        Flushes what is queued; the writer thread spills what it cannot
+        write. If it is still busy after `timeout`, the turns stay with it,
+        so nothing is spilled that it may yet write.
+        """
+        if self._thread is None:
+            return
+        thread = self._thread
+        self._thread = None
+        self._stopping.set()
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Write-behind still flushing after {timeout}s; leaving the unwritten turns to it")
+            return
+
+        # Turns submitted while the writer was draining
+        pending = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                pending.append(record)
+        if pending:
+            self._spill(pending)
+
+    def submit(self, user_id, user_message, bot_response, conversation_id=None, intent=None, confidence=None):
+        """
+        Queues a chat turn for writing.
+
+        Returns:
+            bool: False if the writer is not running or its queue is full;
+                  the caller should then write the turn itself.
+        """
+        if self._thread is None:
+            return False
+        now = datetime.now()
+        record = {
+            'user_id': user_id,
+            'conversation_id': conversation_id,
+            'user_message': user_message,
+            'bot_response': bot_response,
+            'intent': intent,
+            'confidence': confidence,
+            'timestamp': now.isoformat(),
+            'enqueued_at': time.time()
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize() + len(self._retry),
+                'written': self.written,
+                'batches': self.batches,
+                'failures': self.failures,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'last_flush_lag_ms': round(self.last_flush_lag_ms, 3),
+                'max_flush_lag_ms': round(self.max_flush_lag_ms, 3),
+                'avg_flush_lag_ms': round(self._total_flush_lag / self.batches, 3) if self.batches else 0.0
+            }
+
+    def _collect(self, draining):
+        """
+        Waits for the next batch. Once draining, only takes what is already
+        queued. Returns (batch, stop_seen).
+        """
+        batch = self._retry
+        self._retry = []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                if draining:
+                    record = self._queue.get_nowait()
+                elif not batch:
+                    record = self._queue.get()
+                else:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        backoff = 0.1
+        attempts = 0
+        while True:
+            batch, stop_seen = self._collect(draining=stopping)
+            stopping = stopping or stop_seen
+            if not batch:
+                if stopping:
+                    return
+                continue
+            try:
+                self._flush(batch)
+                backoff = 0.1
+                attempts = 0
+            except Exception as e:
+                attempts += 1
+                with self._lock:
+                    self.failures += 1
+                logger.error(f"Write-behind flush of {len(batch)} turns failed (attempt {attempts}): {e}")
+                if stopping or self._stopping.is_set() or attempts >= self.max_attempts:
+                    # Give up on the batch; start() replays the spill file
+                    self._spill(batch)
+                    attempts = 0
+                    continue
+                # Kept for the next attempt
+                self._retry = batch
+                # Cut short by stop()
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+    def _flush(self, batch):
+        """
+        Writes a batch of turns in one transaction with bulk inserts.
+        """
+        db_session = get_db_session()
+        try:
+            # Turns for conversations that do not exist (yet) start a new one,
+            # just like the synchronous path
+            requested_ids = {record['conversation_id'] for record in batch if record['conversation_id']}
+            # Conversation ids may arrive as strings; map them to the stored ids
+            existing_ids = {}
+            if requested_ids:
+                existing_ids = {
+                    str(row[0]): row[0] for row in
+                    db_session.query(Conversation.id).filter(Conversation.id.in_(requested_ids)).all()
+                }
+
+            now = datetime.now()
+            conversations = []
+            for record in batch:
+                conversation_id = existing_ids.get(str(record['conversation_id']))
+                if conversation_id is None:
+                    conversation = Conversation(user_id=record['user_id'], created_at=now, last_updated=now)
+                    db_session.add(conversation)
+                    conversations.append(conversation)
+                else:
+                    conversations.append(conversation_id)
+            db_session.flush()
+
+            rows = []
+            for record, conversation in zip(batch, conversations):
+                conversation_id = conversation if isinstance(conversation, int) else conversation.id
+                timestamp = datetime.fromisoformat(record['timestamp'])
+                rows.append({
+                    'conversation_id': conversation_id,
+                    'sender': 'user',
+                    'content': record['user_message'],
+                    # Absent from turns spilled before they were recorded
+                    'intent': record.get('intent'),
+                    'confidence': record.get('confidence'),
+                    'timestamp': timestamp
+                })
+                rows.append({
+                    'conversation_id': conversation_id,
+                    'sender': 'bot',
+                    'content': record['bot_response'],
+                    'intent': None,
+                    'confidence': None,
+                    'timestamp': timestamp
+                })
+            db_session.execute(insert(Message), rows)
+
+            touched = {conversation for conversation in conversations if isinstance(conversation, int)}
+            if touched:
+                db_session.execute(
+                    update(Conversation).where(Conversation.id.in_(touched)).values(last_updated=now)
+                )
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+
+        lag_ms = (time.time() - min(record['enqueued_at'] for record in batch)) * 1000
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_lag_ms = lag_ms
+            self.max_flush_lag_ms = max(self.max_flush_lag_ms, lag_ms)
+            self._total_flush_lag += lag_ms
+
+    def _spill(self, records):
+        if not self.spill_path:
+            logger.error(f"Write-behind lost {len(records)} unwritten turns (no spill file configured)")
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Write-behind could not spill {len(records)} turns to {self.spill_path}: {e}")
+            return
+        with self._lock:
+            self.spilled += len(records)
+        logger.warning(f"Write-behind spilled {len(records)} unwritten turns to {self.spill_path}")
+
+    def _replay_spill(self):
+        """
+        Writes the turns spilled by a previous run, then removes the file.
+
+        Every server worker shares the spill file, so the file is first
+        claimed by renaming it; the worker that loses the race skips the
+        replay instead of writing the same turns again.
+        """
+        if not self.spill_path:
+            return
+        claimed_path = f"{self.spill_path}.{os.getpid()}.replaying"
+        try:
+            os.replace(self.spill_path, claimed_path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"Write-behind could not claim {self.spill_path}: {e}")
+            return
+        try:
+            with open(claimed_path, 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.error(f"Write-behind could not read {claimed_path}: {e}")
+            return
+
+        for start in range(0, len(records), self.batch_size):
+            try:
+                self._flush(records[start:start + self.batch_size])
+            except Exception as e:
+                logger.error(f"Write-behind could not replay {self.spill_path}: {e}")
+                # Spill back only what is still unwritten, so nothing is written twice
+                self._spill(records[start:])
+                os.remove(claimed_path)
+                return
+        os.remove(claimed_path)
+        with self._lock:
+            self.replayed += len(records)
+        logger.info(f"Write-behind replayed {len(records)} spilled turns from {self.spill_path}")
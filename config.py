@@ -14,6 +14,37 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///database/chat.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool for server databases (PostgreSQL, MySQL, ...)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # seconds, -1 = never
+    
+    # SQLite file databases: WAL journal, synchronous=NORMAL and a single
+    # writer connection next to a pool of readers (see database/db_handler.py)
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True').lower() == 'true'
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_READER_POOL_SIZE = int(os.environ.get('SQLITE_READER_POOL_SIZE', '8'))
+    # Seconds a write waits for the single writer connection
+    SQLITE_WRITER_TIMEOUT = float(os.environ.get('SQLITE_WRITER_TIMEOUT', '30'))
+    
+    # Write-behind persistence of chat turns (opt-in): replies are sent before
+    # the turn is written, and turns are inserted in batches
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'False').lower() == 'true'
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '100'))
+    WRITE_BEHIND_MAX_WAIT_MS = float(os.environ.get('WRITE_BEHIND_MAX_WAIT_MS', '200'))
+    WRITE_BEHIND_MAX_QUEUE = int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', '10000'))
+    # A batch that fails this many times is spilled instead of retried
+    WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+    # Unwritten turns are saved here on shutdown and replayed on the next start
+    WRITE_BEHIND_SPILL_PATH = os.environ.get(
+        'WRITE_BEHIND_SPILL_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'write_behind_spill.jsonl')
+    )
+    
     # Chatbot configuration
     CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', '0.7'))
     DEFAULT_RESPONSE = "I'm sorry, I don't understand that. Could you rephrase?"
@@ -21,6 +52,68 @@ class Config:
     
     # NLP configuration
     LANGUAGE_MODEL = os.environ.get('LANGUAGE_MODEL', 'en_core_web_sm')
+    # spaCy powers the semantic fallback; without it TF-IDF similarity is used
+    # and startup skips loading the language model entirely
+    SPACY_ENABLED = os.environ.get('SPACY_ENABLED', 'True').lower() == 'true'
+    PREPROCESS_CACHE_SIZE = int(os.environ.get('PREPROCESS_CACHE_SIZE', '10000'))
+    # Training corpus preprocessing: worker processes (0 = one per CPU, 1 = serial);
+    # corpora smaller than PREPROCESS_PARALLEL_MIN are always done serially
+    PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', '0'))
+    PREPROCESS_PARALLEL_MIN = int(os.environ.get('PREPROCESS_PARALLEL_MIN', '2000'))
+    PREPROCESS_CHUNK_SIZE = int(os.environ.get('PREPROCESS_CHUNK_SIZE', '500'))
+    
+    # TF-IDF retrains start from the deployed coefficients when the intents are
+    # unchanged and at least WARM_START_MIN_OVERLAP of the vocabulary is shared
+    WARM_START_ENABLED = os.environ.get('WARM_START_ENABLED', 'True').lower() == 'true'
+    WARM_START_MIN_OVERLAP = float(os.environ.get('WARM_START_MIN_OVERLAP', '0.5'))
+    
+    # Trainer features: 'tfidf' (TF-IDF + LogisticRegression, whole corpus in
+    # memory) or 'hashing' (feature hashing + SGDClassifier trained with
+    # partial_fit over a streamed corpus; no vocabulary, joblib artifacts only)
+    FEATURE_MODE = os.environ.get('FEATURE_MODE', 'tfidf')
+    HASHING_N_FEATURES = int(os.environ.get('HASHING_N_FEATURES', str(2 ** 18)))
+    HASHING_BATCH_SIZE = int(os.environ.get('HASHING_BATCH_SIZE', '10000'))
+    HASHING_EPOCHS = int(os.environ.get('HASHING_EPOCHS', '10'))
+    HASHING_ALPHA = float(os.environ.get('HASHING_ALPHA', '0.0001'))
+    # Optional JSONL file of labeled utterances ({"text": ..., "intent": ...})
+    # streamed into hashing-mode training on top of the training data
+    TRAINING_UTTERANCES_PATH = os.environ.get('TRAINING_UTTERANCES_PATH', '')
+    
+    # Online learning (see chatbot/online_learner.py): partial_fit updates from
+    # rated or admin-labeled messages; needs a partial_fit model (FEATURE_MODE=hashing)
+    ONLINE_MIN_RATING = int(os.environ.get('ONLINE_MIN_RATING', '4'))
+    ONLINE_MIN_SAMPLES = int(os.environ.get('ONLINE_MIN_SAMPLES', '20'))
+    ONLINE_MAX_SAMPLES = int(os.environ.get('ONLINE_MAX_SAMPLES', '5000'))
+    # Training patterns mixed into each update per new sample, against drift
+    ONLINE_REHEARSAL_RATIO = float(os.environ.get('ONLINE_REHEARSAL_RATIO', '1.0'))
+    ONLINE_KEEP_CHECKPOINTS = int(os.environ.get('ONLINE_KEEP_CHECKPOINTS', '5'))
+    ONLINE_STATE_PATH = os.environ.get(
+        'ONLINE_STATE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot', 'model', 'online_state.json')
+    )
+    
+    # Model artifacts: 'auto', 'compact' (flat arrays, no sklearn) or 'joblib'
+    MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'auto')
+    
+    # Semantic fallback index: 'brute' scans every pattern, 'ivf' is approximate
+    SEMANTIC_INDEX_MODE = os.environ.get('SEMANTIC_INDEX_MODE', 'brute')
+    SEMANTIC_INDEX_NLIST = int(os.environ.get('SEMANTIC_INDEX_NLIST', '0'))  # 0 = sqrt(#patterns)
+    SEMANTIC_INDEX_NPROBE = int(os.environ.get('SEMANTIC_INDEX_NPROBE', '8'))
+    
+    # Read-only matrices (pattern vectors, spaCy vector table) are written here
+    # once and memory-mapped by every worker process, which then share one copy
+    SHARED_ARRAYS_ENABLED = os.environ.get('SHARED_ARRAYS_ENABLED', 'True').lower() == 'true'
+    SHARED_ARRAY_DIR = os.environ.get(
+        'SHARED_ARRAY_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot', 'model', 'shared')
+    )
+    
+    # Rewritten whenever a worker changes intent responses; the other workers
+    # reload theirs when it differs (checked every MODEL_RELOAD_INTERVAL)
+    RESPONSES_VERSION_PATH = os.environ.get(
+        'RESPONSES_VERSION_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'responses.version')
+    )
     
     # Logging configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -1,30 +1,156 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import create_engine, event, inspect, or_, Insert, Update, Delete
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, scoped_session, Session as OrmSession
 from sqlalchemy.ext.declarative import declarative_base
 import os
 import sys
+from contextlib import contextmanager
 
 # Add the project root to the path so we can import the config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 from database.models import Base, Conversation, Message, Intent, Pattern, Response, Feedback
 from database.user_models import User  # Import User model
+from database.migrations import upgrade
 
-# Create engine
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+def is_sqlite_file(url):
+    """True for SQLite databases stored in a file (not in memory)"""
+    url = make_url(url)
+    database = url.database or ''
+    return (
+        url.get_backend_name() == 'sqlite'
+        and database not in ('', ':memory:')
+        and not database.startswith('file::memory:')
+        and 'mode=memory' not in database
+    )
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning: WAL lets readers run alongside the writer,
+    and synchronous=NORMAL only fsyncs at checkpoints instead of every commit"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{int(Config.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_engines(url, sqlite_tuning=True):
+    """Create the (writer, reader) engines for a database URL
+
+    For SQLite files with tuning enabled, the writer is a single pooled
+    connection, so writers queue in the pool instead of fighting over the
+    database lock, and reads use a separate pool. Both apply the SQLite
+    PRAGMAs on connect. Server databases (PostgreSQL, MySQL, ...) get one
+    engine with the DB_POOL_* settings; other SQLite URLs one default engine.
+    """
+    if make_url(url).get_backend_name() != 'sqlite':
+        shared_engine = create_engine(
+            url,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            pool_pre_ping=Config.DB_POOL_PRE_PING,
+            pool_recycle=Config.DB_POOL_RECYCLE
+        )
+        return shared_engine, shared_engine
+
+    if not (sqlite_tuning and is_sqlite_file(url)):
+        shared_engine = create_engine(url)
+        return shared_engine, shared_engine
+
+    writer = create_engine(url, pool_size=1, max_overflow=0, pool_timeout=Config.SQLITE_WRITER_TIMEOUT)
+    reader = create_engine(url, pool_size=Config.SQLITE_READER_POOL_SIZE, max_overflow=0)
+    for sqlite_engine in (writer, reader):
+        event.listen(sqlite_engine, 'connect', _apply_sqlite_pragmas)
+    return writer, reader
+
+class RoutingSession(OrmSession):
+    """Session that reads through the reader engine and writes through the
+    writer engine. After its first write it stays on the writer until the
+    transaction ends, so it always sees its own uncommitted changes."""
+    writer_engine = None
+    reader_engine = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # Flushes are flagged by _route_flush_to_writer before they emit SQL
+        if self.info.get('use_writer') or isinstance(clause, (Insert, Update, Delete)):
+            self.info['use_writer'] = True
+            return self.writer_engine
+        return self.reader_engine
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _route_flush_to_writer(session, flush_context, instances):
+    session.info['use_writer'] = True
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _release_writer(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('use_writer', None)
 
-# Create session factory
-Session = scoped_session(sessionmaker(bind=engine))
+def create_session_factory(writer, reader):
+    """sessionmaker that routes between the writer and reader engines"""
+    if writer is reader:
+        return sessionmaker(bind=writer)
+    session_class = type('BoundRoutingSession', (RoutingSession,), {
+        'writer_engine': writer,
+        'reader_engine': reader
+    })
+    return sessionmaker(class_=session_class)
+
+# Create engines; `engine` is the one used for writes and schema changes
+engine, reader_engine = create_engines(Config.SQLALCHEMY_DATABASE_URI, Config.SQLITE_TUNING)
+
+# Create session factories: `session_factory` makes independent sessions
+# (e.g. one per API request), `Session` is the thread-local scoped registry
+session_factory = create_session_factory(engine, reader_engine)
+Session = scoped_session(session_factory)
 
 def get_db_session():
     """Get a new database session"""
     return Session()
 
+# Callbacks notified after a commit that touched intents or their responses
+_intent_change_listeners = []
+
+def on_intent_change(callback):
+    """Register callback(intent_ids, intent_names), called after every commit
+    that added, changed or deleted an Intent or Response row"""
+    _intent_change_listeners.append(callback)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_intent_changes(session, flush_context):
+    changes = session.info.setdefault('intent_changes', (set(), set()))
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Intent):
+            changes[0].add(obj.id)
+            changes[1].add(obj.name)
+            # A renamed intent must drop its old name too
+            changes[1].update(inspect(obj).attrs.name.history.deleted)
+        elif isinstance(obj, Response):
+            changes[0].add(obj.intent_id)
+
+@event.listens_for(Session, 'after_commit')
+def _notify_intent_changes(session):
+    intent_ids, intent_names = session.info.pop('intent_changes', (set(), set()))
+    if not intent_ids and not intent_names:
+        return
+    for callback in _intent_change_listeners:
+        callback(intent_ids, intent_names)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_intent_changes(session):
+    session.info.pop('intent_changes', None)
+
 def init_db():
     """Initialize the database by creating all tables"""
     # Create tables if they don't exist
     Base.metadata.create_all(engine)
     
+    # Bring tables created by older versions up to date (e.g. new indexes)
+    upgrade(engine, Base.metadata)
+    
     # Initialize with default intents if the intents table is empty
     session = get_db_session()
     intent_count = session.query(Intent).count()
@@ -84,77 +210,94 @@ def init_db():
     
     session.close()
 
-def get_all_intents():
+@contextmanager
+def _session_scope(session=None):
+    """Yield the caller's session, or a new one that is closed afterwards
+
+    Helpers take an optional `session` so a request can run them all on
+    its own session (and a single pooled connection).
+    """
+    if session is not None:
+        yield session
+        return
+    db_session = get_db_session()
+    try:
+        yield db_session
+    finally:
+        db_session.close()
+
+def get_all_intents(session=None):
     """Get all intents from the database"""
-    session = get_db_session()
-    intents = session.query(Intent).all()
-    session.close()
-    return intents
+    with _session_scope(session) as db_session:
+        return db_session.query(Intent).all()
 
-def get_intent_patterns(intent_id):
+def get_intent_patterns(intent_id, session=None):
     """Get all patterns for a specific intent"""
-    session = get_db_session()
-    patterns = session.query(Pattern).filter_by(intent_id=intent_id).all()
-    session.close()
-    return patterns
+    with _session_scope(session) as db_session:
+        return db_session.query(Pattern).filter_by(intent_id=intent_id).all()
 
-def get_intent_responses(intent_id):
+def get_intent_responses(intent_id, session=None):
     """Get all responses for a specific intent"""
-    session = get_db_session()
-    responses = session.query(Response).filter_by(intent_id=intent_id).all()
-    session.close()
-    return responses
+    with _session_scope(session) as db_session:
+        return db_session.query(Response).filter_by(intent_id=intent_id).all()
+
+def get_response_texts(intent_ids=None, intent_names=None, session=None):
+    """Get (intent name, response text) pairs with a single joined query
+
+    Intents without responses yield one pair with text None. Without
+    arguments every intent is returned; otherwise only those matching
+    any of the given ids or names.
+    """
+    with _session_scope(session) as db_session:
+        query = db_session.query(Intent.name, Response.text).outerjoin(Response, Response.intent_id == Intent.id)
+        if intent_ids is not None or intent_names is not None:
+            query = query.filter(or_(
+                Intent.id.in_(list(intent_ids or [])),
+                Intent.name.in_(list(intent_names or []))
+            ))
+        return query.order_by(Intent.id, Response.id).all()
 
-def add_conversation(user_id):
+def add_conversation(user_id, session=None):
     """Add a new conversation to the database"""
-    session = get_db_session()
-    conversation = Conversation(user_id=user_id)
-    session.add(conversation)
-    session.commit()
-    conversation_id = conversation.id
-    session.close()
-    return conversation_id
+    with _session_scope(session) as db_session:
+        conversation = Conversation(user_id=user_id)
+        db_session.add(conversation)
+        db_session.commit()
+        return conversation.id
 
-def add_message(conversation_id, content, sender, intent=None, confidence=None):
+def add_message(conversation_id, content, sender, intent=None, confidence=None, session=None):
     """Add a new message to the database"""
-    session = get_db_session()
-    message = Message(
-        conversation_id=conversation_id,
-        content=content,
-        sender=sender,
-        intent=intent,
-        confidence=confidence
-    )
-    session.add(message)
-    session.commit()
-    message_id = message.id
-    session.close()
-    return message_id
+    with _session_scope(session) as db_session:
+        message = Message(
+            conversation_id=conversation_id,
+            content=content,
+            sender=sender,
+            intent=intent,
+            confidence=confidence
+        )
+        db_session.add(message)
+        db_session.commit()
+        return message.id
 
-def add_feedback(message_id, rating, comment=None):
+def add_feedback(message_id, rating, comment=None, confirmed_intent=None, session=None):
     """Add feedback for a message"""
-    session = get_db_session()
-    feedback = Feedback(
-        message_id=message_id,
-        rating=rating,
-        comment=comment
-    )
-    session.add(feedback)
-    session.commit()
-    feedback_id = feedback.id
-    session.close()
-    return feedback_id
+    with _session_scope(session) as db_session:
+        feedback = Feedback(
+            message_id=message_id,
+            rating=rating,
+            comment=comment,
+            confirmed_intent=confirmed_intent
+        )
+        db_session.add(feedback)
+        db_session.commit()
+        return feedback.id
 
-def get_conversation_messages(conversation_id):
+def get_conversation_messages(conversation_id, session=None):
     """Get all messages for a specific conversation"""
-    session = get_db_session()
-    messages = session.query(Message).filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
-    session.close()
-    return messages
+    with _session_scope(session) as db_session:
+        return db_session.query(Message).filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
 
-def get_user_conversations(user_id):
+def get_user_conversations(user_id, session=None):
     """Get all conversations for a specific user"""
-    session = get_db_session()
-    conversations = session.query(Conversation).filter_by(user_id=user_id).order_by(Conversation.start_time.desc()).all()
-    session.close()
-    return conversations
\ No newline at end of file
+    with _session_scope(session) as db_session:
+        return db_session.query(Conversation).filter_by(user_id=user_id).order_by(Conversation.last_updated.desc()).all()
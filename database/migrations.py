@@ -0,0 +1,69 @@
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+def ensure_columns(engine, metadata):
+    """Add columns declared on the models that existing tables lack
+
+    Only nullable columns without server defaults are added, which every
+    database supports with a plain ALTER TABLE ... ADD COLUMN. Idempotent;
+    safe to run on every start.
+
+    Returns:
+        list: 'table.column' names of the columns that were added
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable or column.server_default is not None:
+                logger.warning(f"Cannot add column {table.name}.{column.name} automatically; migrate it by hand")
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            logger.info(f"Adding column {column.name} to {table.name}")
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def ensure_indexes(engine, metadata):
+    """Create every index declared on the models that the database lacks
+
+    create_all() only creates indexes together with new tables, so
+    databases created before an index was declared are brought up to date
+    here. Idempotent; safe to run on every start.
+
+    Returns:
+        list: Names of the indexes that were created
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            logger.info(f"Creating index {index.name} on {table.name}")
+            index.create(bind=engine, checkfirst=True)
+            created.append(index.name)
+    return created
+
+def upgrade(engine, metadata):
+    """Apply all schema migrations to an existing database
+
+    Returns:
+        list: Names of the columns and indexes that were created
+    """
+    return ensure_columns(engine, metadata) + ensure_indexes(engine, metadata)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,6 +15,11 @@ class Conversation(Base):
     last_updated = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_active = Column(Boolean, default=True)
     
+    # A user's conversations, most recent first
+    __table_args__ = (
+        Index('ix_conversations_user_id_last_updated', 'user_id', 'last_updated'),
+    )
+    
     # Relationship with messages
     messages = relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
     
@@ -29,6 +34,15 @@ class Message(Base):
     sender = Column(String(20), nullable=False)  # 'user' or 'bot'
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.now)
+    # Intent detected for a user message, and its confidence
+    intent = Column(String(50), nullable=True)
+    confidence = Column(Float, nullable=True)
+    
+    # Conversation history in order, and time-range statistics
+    __table_args__ = (
+        Index('ix_messages_conversation_id_timestamp', 'conversation_id', 'timestamp'),
+        Index('ix_messages_timestamp', 'timestamp'),
+    )
     
     # Relationship with feedback
     feedback = relationship('Feedback', backref='message', lazy=True, uselist=False)
@@ -55,7 +69,7 @@ class Pattern(Base):
     __tablename__ = 'patterns'
     
     id = Column(Integer, primary_key=True)
-    intent_id = Column(Integer, ForeignKey('intents.id'), nullable=False)
+    intent_id = Column(Integer, ForeignKey('intents.id'), nullable=False, index=True)
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.now)
     
@@ -66,7 +80,7 @@ class Response(Base):
     __tablename__ = 'responses'
     
     id = Column(Integer, primary_key=True)
-    intent_id = Column(Integer, ForeignKey('intents.id'), nullable=False)
+    intent_id = Column(Integer, ForeignKey('intents.id'), nullable=False, index=True)
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.now)
     
@@ -77,9 +91,10 @@ class Feedback(Base):
     __tablename__ = 'feedback'
     
     id = Column(Integer, primary_key=True)
-    message_id = Column(Integer, ForeignKey('messages.id'), nullable=False)
+    message_id = Column(Integer, ForeignKey('messages.id'), nullable=False, index=True)
     rating = Column(Integer, nullable=True)  # 1-5 rating
     comment = Column(Text, nullable=True)
+    confirmed_intent = Column(String(50), nullable=True)  # Correct intent, set by an admin
     created_at = Column(DateTime, default=datetime.now)
     
     def __repr__(self):
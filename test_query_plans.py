@@ -0,0 +1,102 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+# Add root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.models import Base, Conversation, Message, Feedback
+from database.user_models import User
+from database.db_handler import (
+    get_conversation_messages, get_user_conversations, get_response_texts, get_intent_patterns
+)
+from database.migrations import ensure_indexes, upgrade
+
+@pytest.fixture
+def db():
+    """In-memory database with the current schema, recording every SELECT"""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    session = sessionmaker(bind=engine)()
+    yield session, statements
+    session.close()
+
+def query_plan(session, statement, parameters):
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+def last_plan(db, run_query):
+    session, statements = db
+    statements.clear()
+    run_query(session)
+    assert statements, "query did not reach the database"
+    return query_plan(session, *statements[-1])
+
+def test_conversation_history_uses_index(db):
+    plan = last_plan(db, lambda session: get_conversation_messages(1, session=session))
+    assert 'ix_messages_conversation_id_timestamp' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_user_conversations_use_index(db):
+    plan = last_plan(db, lambda session: get_user_conversations(1, session=session))
+    assert 'ix_conversations_user_id_last_updated' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_intent_patterns_use_index(db):
+    plan = last_plan(db, lambda session: get_intent_patterns(1, session=session))
+    assert 'ix_patterns_intent_id' in plan
+
+def test_response_table_join_uses_index(db):
+    plan = last_plan(db, lambda session: get_response_texts(session=session))
+    assert 'ix_responses_intent_id' in plan
+
+def test_feedback_lookup_uses_index(db):
+    plan = last_plan(db, lambda session: session.query(Feedback).filter_by(message_id=1).all())
+    assert 'ix_feedback_message_id' in plan
+
+def test_recent_messages_use_timestamp_index(db):
+    plan = last_plan(
+        db,
+        lambda session: session.query(Message).filter(Message.timestamp >= text("'2024-01-01'")).all()
+    )
+    assert 'ix_messages_timestamp' in plan
+
+def test_ensure_indexes_upgrades_existing_database():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX {index.name}"))
+
+    created = ensure_indexes(engine, Base.metadata)
+    assert 'ix_messages_conversation_id_timestamp' in created
+    assert 'ix_conversations_user_id_last_updated' in created
+    assert ensure_indexes(engine, Base.metadata) == []
+
+def test_upgrade_adds_missing_columns():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table, column in (('messages', 'intent'), ('messages', 'confidence'), ('feedback', 'confirmed_intent')):
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+    created = upgrade(engine, Base.metadata)
+    assert {'messages.intent', 'messages.confidence', 'feedback.confirmed_intent'} <= set(created)
+    assert upgrade(engine, Base.metadata) == []
+
+    session = sessionmaker(bind=engine)()
+    session.add(Conversation(id=1, user_id=1))
+    session.add(Message(conversation_id=1, sender='user', content='hi', intent='greeting', confidence=0.9))
+    session.commit()
+    assert session.query(Message.intent).scalar() == 'greeting'
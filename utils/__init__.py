@@ -2,9 +2,10 @@
 # This file makes the utils directory a Python package
 
 from utils.logger import setup_logger
-from utils.text_processor import preprocess_text
+from utils.text_processor import preprocess_text, preprocess_cache_stats
 
 __all__ = [
     'setup_logger',
-    'preprocess_text'
+    'preprocess_text',
+    'preprocess_cache_stats'
 ]
\ No newline at end of file
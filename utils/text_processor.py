@@ -1,29 +1,98 @@
+import os
 import re
-import string
+import logging
+import threading
 import nltk
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
+from config import Config
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+logger = logging.getLogger(__name__)
 
-# Initialize lemmatizer
-lemmatizer = WordNetLemmatizer()
+# NLTK data is installed ahead of time with `python download_nltk.py`;
+# importing this module never goes to the network, and the stopwords and
+# lemmatizer are only loaded on first use, so missing data fails the first
+# preprocessing call (and /health/ready) instead of every import
+NLTK_RESOURCES = ('tokenizers/punkt', 'corpora/stopwords', 'corpora/wordnet')
 
-# Get English stopwords
-stop_words = set(stopwords.words('english'))
+def missing_nltk_resources():
+    """Return the NLTK resources that are not installed locally"""
+    missing = []
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource)
+    return missing
+
+# Bump whenever preprocess_text() output changes (cleaning rules, stopwords,
+# lemmatizer); cached preprocessed training patterns are keyed by it
+PREPROCESS_VERSION = 1
+
+_missing = missing_nltk_resources()
+if _missing:
+    logger.warning(f"NLTK data not found: {', '.join(_missing)}. Run `python download_nltk.py` to install it.")
+
+# Loaded by _load_nltk_data()
+lemmatizer = None
+stop_words = None
+_nltk_lock = threading.Lock()
+
+def _load_nltk_data():
+    """Load the lemmatizer and English stopwords once
+
+    Raises:
+        LookupError: NLTK data is missing; the message names download_nltk.py
+    """
+    global lemmatizer, stop_words
+    if stop_words is not None:
+        return
+    with _nltk_lock:
+        if stop_words is not None:
+            return
+        missing = missing_nltk_resources()
+        if missing:
+            raise LookupError(
+                f"NLTK data not found: {', '.join(missing)}. Run `python download_nltk.py` to install it."
+            )
+        lemmatizer = WordNetLemmatizer()
+        stop_words = set(stopwords.words('english'))
+
+def nltk_data_available():
+    """Return True once the NLTK data preprocessing needs is loaded"""
+    try:
+        _load_nltk_data()
+    except LookupError:
+        return False
+    return True
+
+@lru_cache(maxsize=Config.PREPROCESS_CACHE_SIZE)
+def _normalize(text):
+    """Lowercased text -> cleaned, stopword-free, lemmatized string (memoized)"""
+    _load_nltk_data()
+
+    # Remove punctuation and numbers
+    text = re.sub(r'[^a-z\s]', '', text)
+    
+    # Tokenize
+    tokens = word_tokenize(text)
+    
+    # Remove stopwords and lemmatize
+    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    
+    # Join tokens back into a string
+    return ' '.join(tokens)
 
 def preprocess_text(text):
     """Preprocess text for NLP tasks
     
+    This is the single normalization step shared by the chat pipeline, the
+    ML classifier and the trainer. Results are kept in a bounded LRU cache,
+    so repeated messages skip tokenization and lemmatization.
+    
     Args:
         text (str): Input text to preprocess
         
@@ -33,26 +102,55 @@ def preprocess_text(text):
     if not text:
         return ""
     
-    # Convert to lowercase
-    text = text.lower()
-    
-    # Remove punctuation
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    
-    # Remove numbers
-    text = re.sub(r'\d+', '', text)
-    
-    # Tokenize
-    tokens = word_tokenize(text)
+    # Lowercase and collapse whitespace so trivially different inputs share a cache entry
+    return _normalize(' '.join(text.lower().split()))
+
+def _preprocess_chunk(texts):
+    return [preprocess_text(text) for text in texts]
+
+def preprocess_many(texts, workers=None, chunk_size=None, min_parallel=None):
+    """Preprocess a list of texts, fanning chunks out to worker processes
     
-    # Remove stopwords
-    tokens = [token for token in tokens if token not in stop_words]
+    Used for training corpora; output order matches the input. Runs serially
+    when there is one worker or fewer texts than `min_parallel`, since the
+    workers first have to load NLTK.
     
-    # Lemmatize
-    tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    Args:
+        texts (list): Texts to preprocess
+        workers (int, optional): Worker processes; 0 means one per CPU.
+            Defaults to Config.PREPROCESS_WORKERS.
+        chunk_size (int, optional): Texts per task. Defaults to Config.PREPROCESS_CHUNK_SIZE.
+        min_parallel (int, optional): Defaults to Config.PREPROCESS_PARALLEL_MIN.
+        
+    Returns:
+        list: Preprocessed texts, in input order
+    """
+    workers = Config.PREPROCESS_WORKERS if workers is None else workers
+    chunk_size = max(1, chunk_size or Config.PREPROCESS_CHUNK_SIZE)
+    min_parallel = Config.PREPROCESS_PARALLEL_MIN if min_parallel is None else min_parallel
+
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1 or len(texts) < min_parallel:
+        return _preprocess_chunk(texts)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_preprocess_chunk, chunks)
+        return [cleaned for chunk in results for cleaned in chunk]
+
+def preprocess_cache_stats():
+    """Return hit/miss counters of the preprocessing cache
     
-    # Join tokens back into a string
-    return ' '.join(tokens)
+    Returns:
+        dict: hits, misses, current size and maximum size of the cache
+    """
+    info = _normalize.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize
+    }
 
 def extract_keywords(text, num_keywords=5):
     """Extract keywords from text